@@ -0,0 +1,396 @@
+import argparse
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Sin NumPy los lotes se revisan de a uno
+    np = None
+
+from constantes import ANCHO, ALTO
+from entidades import Jugador, Estrella, VELOCIDAD_JUGADOR, VELOCIDAD_SALTO, GRAVEDAD
+import niveles
+
+# Análisis de alcance: a qué plataformas puede llegar el jugador y qué
+# monedas puede recoger, sin jugar la partida.
+#
+# Los arcos de salto y de caída se calculan una vez tick a tick con la misma
+# física que Jugador (a 60 Hz). Como el jugador se mueve de a
+# VELOCIDAD_JUGADOR píxeles y empieza en una x múltiplo de eso, sus
+# posiciones posibles forman una rejilla; cada vuelo sigue el conjunto de
+# columnas donde puede estar en cada tick (un bit por columna): se ensancha
+# una columna por lado, y las columnas que caen en la banda de aterrizaje de
+# una plataforma (o del barrido si cae más de 20 px) aterrizan en ella y
+# salen del vuelo. Así los aterrizajes intermedios cuentan igual que en el
+# juego, también los que atrapan al jugador mientras sube.
+#
+# De cada plataforma salen dos vuelos: saltando desde cualquier punto y
+# cayéndose por un borde. Eso arma el grafo de plataformas, y las monedas
+# que toca algún vuelo (o el jugador parado) desde una plataforma a la que
+# se llega desde el suelo se pueden recoger. Con NumPy los mismos vuelos se
+# hacen a la vez para miles de niveles candidatos de una pantalla.
+#
+# Es una aproximación por debajo: no cuenta el salto en el aire después de
+# salirse por un borde, ni aterrizajes en más de una plataforma en el mismo
+# tick o encadenados (al aterrizar, Jugador.gravedad sigue comparando con
+# las plataformas hasta 20 px más arriba; el resultado depende del orden),
+# ni monedas tocadas en el tick de un aterrizaje. Se supone que sobre una
+# plataforma se puede caminar de punta a punta. El suelo (ALTO - 50) cubre
+# todo el ancho y es donde empieza el jugador; a él se vuelve siempre
+# bajando (S).
+#
+# Uso:  python alcance.py                     (niveles incluidos)
+#       python alcance.py mundos/normal.json  (un nivel propio)
+#       python alcance.py --lote 10000        (niveles al azar por segundo)
+
+BANDA = 20      # Tolerancia de aterrizaje de Jugador.gravedad
+PASO = VELOCIDAD_JUGADOR
+SUELO = ALTO - 50
+DISTANCIA_INICIO = 150  # Los enemigos no pueden empezar tan cerca del jugador
+
+_jugador = Jugador(0, 0)
+ANCHO_JUGADOR, ALTO_JUGADOR = _jugador.ancho, _jugador.alto
+INICIO_X = Jugador(100, 0).x
+_moneda = Estrella(0, 0)
+ANCHO_MONEDA, ALTO_MONEDA = _moneda.ancho, _moneda.alto
+
+
+def arco(velocidad_inicial):
+    # Altura de los pies respecto al punto de partida en cada tick (el 0 es
+    # el de partida) y, desde el tick 1, el rango de alturas del borde
+    # superior de una plataforma que lo atrapa en ese tick
+    pies = [0.0]
+    bandas = [None]
+    y = 0.0
+    vel = velocidad_inicial
+    while y <= ALTO:
+        vel += GRAVEDAD
+        antes = y
+        y += vel
+        pies.append(y)
+        # Cayendo más de BANDA px en un tick se aterriza por barrido
+        bandas.append((antes, y) if y - antes > BANDA else (y - BANDA, y))
+    return pies, bandas
+
+
+ARCOS = (arco(VELOCIDAD_SALTO), arco(0))  # Saltar y caerse por un borde
+
+
+def _rejilla(plataformas):
+    # Primera x y cantidad de columnas que cubren el nivel con un margen
+    izquierda = min([0] + [p[0] for p in plataformas]) - ANCHO_JUGADOR
+    derecha = max([ANCHO] + [p[0] + p[2] for p in plataformas]) + PASO
+    x0 = (izquierda // PASO - 1) * PASO
+    return x0, (derecha - x0) // PASO + 1
+
+
+def _bits(lo, hi, x0, n):
+    # Columnas con lo < x < hi
+    primera = max(0, (lo - x0) // PASO + 1)
+    ultima = min(n - 1, -((x0 - hi) // PASO) - 1)
+    if primera > ultima:
+        return 0
+    return ((1 << (ultima - primera + 1)) - 1) << primera
+
+
+# Un nivel
+
+def analizar(plataformas, objetos=()):
+    # Devuelve (aristas, toques): para cada plataforma (0 = suelo,
+    # i = plataformas[i - 1]) el conjunto de plataformas a las que llega de
+    # un vuelo y el de objetos (x, y, ancho, alto) que toca
+    x0, n = _rejilla(plataformas)
+    completo = (1 << n) - 1
+    todas = [(None, SUELO)] + [(p[0], p[1]) for p in plataformas]
+    zonas = [completo] + [_bits(p[0] - ANCHO_JUGADOR, p[0] + p[2], x0, n) for p in plataformas]
+    zonas_obj = [_bits(o[0] - ANCHO_JUGADOR, o[0] + o[2], x0, n) for o in objetos]
+    # Columnas donde aterrizar en c puede seguir en otra plataforma
+    cascada = [0] * len(todas)
+    for c in range(1, len(todas)):
+        for q in range(1, len(todas)):
+            if q != c and 0 <= todas[c][1] - todas[q][1] <= BANDA:
+                cascada[c] |= zonas[q]
+
+    aristas = {}
+    toques = {}
+    for a, (_, ya) in enumerate(todas):
+        llega = set()
+        toca = set()
+        for pies, bandas in ARCOS:
+            libres = zonas[a]
+            for s in range(len(pies)):
+                pie = ya + pies[s]
+                if s:
+                    libres = (libres | libres << 1 | libres >> 1) & completo
+                    lo, hi = bandas[s]
+                    vistos = repetidos = 0
+                    atrapados = []
+                    for c in range(1, len(todas)):
+                        if lo <= todas[c][1] - ya <= hi:
+                            h = libres & zonas[c]
+                            if h:
+                                repetidos |= vistos & h
+                                vistos |= h
+                                atrapados.append((c, h))
+                    for c, h in atrapados:
+                        if h & ~repetidos & ~cascada[c]:
+                            llega.add(c)
+                    libres &= ~vistos
+                for m, (_, oy, _, oalto) in enumerate(objetos):
+                    if pie - ALTO_JUGADOR < oy + oalto and pie > oy and libres & zonas_obj[m]:
+                        toca.add(m)
+                if pie > SUELO and libres:
+                    llega.add(0)
+                    break
+                if not libres:
+                    break
+        llega.discard(a)
+        aristas[a] = llega
+        toques[a] = toca
+    return aristas, toques
+
+
+def _cierre(aristas):
+    # Plataformas a las que se llega desde el suelo
+    vistas = {0}
+    pendientes = [0]
+    while pendientes:
+        for j in aristas[pendientes.pop()]:
+            if j not in vistas:
+                vistas.add(j)
+                pendientes.append(j)
+    return vistas
+
+
+def alcanzables(plataformas):
+    # Índices de analizar() a los que se llega desde el suelo
+    return _cierre(analizar(plataformas)[0])
+
+
+def apoyada(entidad, plataformas):
+    # La entidad empieza parada sobre una plataforma o sobre el suelo
+    pie = entidad.y + entidad.alto
+    if pie == SUELO:
+        return True
+    return any(pie == p[1] and entidad.x + entidad.ancho > p[0] and entidad.x < p[0] + p[2]
+               for p in plataformas)
+
+
+def validar(plataformas, monedas=(), goombas=(), tortugas=()):
+    # Lista de problemas del nivel (vacía si todo está bien)
+    objetos = [(m.x, m.y, m.ancho, m.alto) for m in monedas]
+    aristas, toques = analizar(plataformas, objetos)
+    vistas = _cierre(aristas)
+    recogibles = set().union(*(toques[a] for a in vistas))
+    problemas = [f"moneda inalcanzable en ({m.x}, {m.y})"
+                 for i, m in enumerate(monedas) if i not in recogibles]
+    # Los hongos se mueven y caen desde el principio: no se revisan
+    for nombre, grupo in (('goomba', goombas), ('tortuga', tortugas)):
+        for e in grupo:
+            if not apoyada(e, plataformas):
+                problemas.append(f"{nombre} en el aire en ({e.x}, {e.y})")
+            elif e.y + e.alto == SUELO and abs(e.x - INICIO_X) < DISTANCIA_INICIO:
+                problemas.append(f"{nombre} demasiado cerca del inicio en ({e.x}, {e.y})")
+    return problemas
+
+
+# Lotes de niveles con NumPy
+
+def _bits_lote(lo, hi, x0, palabras):
+    # Como _bits para arreglos: (..., palabras) enteros de 64 bits
+    x = x0 + PASO * np.arange(palabras * 64)
+    dentro = (x > lo[..., None]) & (x < hi[..., None])
+    return np.packbits(dentro, axis=-1, bitorder='little').view('<u8')
+
+
+def _ensanchar(bits):
+    # Cada columna marcada marca también sus vecinas
+    cero = np.zeros_like(bits[..., :1])
+    izquierda = (bits << 1) | np.concatenate([cero, bits[..., :-1] >> 63], axis=-1)
+    derecha = (bits >> 1) | np.concatenate([bits[..., 1:] << 63, cero], axis=-1)
+    return bits | izquierda | derecha
+
+
+def _alguno(bits):
+    # ¿Hay alguna columna marcada? (más rápido que any() sobre 2 o 3 palabras)
+    resultado = bits[..., 0]
+    for w in range(1, bits.shape[-1]):
+        resultado = resultado | bits[..., w]
+    return resultado != 0
+
+
+def validar_lote(plataformas, monedas):
+    # Niveles de una pantalla (plataformas entre x = 0 y ANCHO).
+    # plataformas: (niveles, n, 4) con (x, y, ancho, alto), ancho 0 para las
+    # que sobran; monedas: (niveles, m, 2) con (x, y). Devuelve (alcanzadas,
+    # recogibles): (niveles, n + 1), con el suelo en la columna 0, y
+    # (niveles, m). Sin NumPy revisa los niveles de a uno.
+    if np is None:
+        return _validar_lote_lento(plataformas, monedas)
+    plataformas = np.asarray(plataformas, dtype=np.int64)
+    monedas = np.asarray(monedas, dtype=np.int64)
+    niveles_n, n_plat = plataformas.shape[:2]
+    x0, columnas = _rejilla([(0, 0, ANCHO)])
+    palabras = -(-columnas // 64)
+
+    x, ancho = plataformas[:, :, 0], plataformas[:, :, 2]
+    validas = np.concatenate([np.ones((niveles_n, 1), bool), ancho > 0], axis=1)
+    y = np.concatenate([np.full((niveles_n, 1), SUELO), plataformas[:, :, 1]], axis=1)
+    completo = _bits_lote(np.array(x0 - PASO), np.array(x0 + PASO * columnas), x0, palabras)
+    zonas = np.concatenate([np.broadcast_to(completo, (niveles_n, 1, palabras)),
+                            _bits_lote(x - ANCHO_JUGADOR, x + ancho, x0, palabras)], axis=1)
+    zonas[~validas] = 0
+    mx, my = monedas[:, :, 0], monedas[:, :, 1]
+    zonas_obj = _bits_lote(mx - ANCHO_JUGADOR, mx + ANCHO_MONEDA, x0, palabras)
+
+    # (nivel, desde, hasta): altura del borde de cada plataforma respecto a
+    # los pies al partir de otra; el suelo y las que sobran no atrapan
+    relativa = (y[:, None, :] - y[:, :, None]).astype(float)
+    puede_atrapar = validas.copy()
+    puede_atrapar[:, 0] = False
+    moneda_rel = (my[:, None, :] - y[:, :, None]).astype(float)
+    cascada = np.zeros_like(zonas)
+    encadena = (relativa >= 0) & (relativa <= BANDA) & puede_atrapar[:, :, None]
+    encadena &= puede_atrapar[:, None, :] & ~np.eye(n_plat + 1, dtype=bool)
+    for q in range(1, n_plat + 1):
+        cascada |= np.where(encadena[:, q, :, None], zonas[:, None, q, :], np.uint64(0))
+    aristas = np.zeros((niveles_n, n_plat + 1, n_plat + 1), bool)
+    toques = np.zeros((niveles_n, n_plat + 1, monedas.shape[1]), bool)
+    for pies, bandas in ARCOS:
+        libres = zonas.copy()
+        for s in range(len(pies)):
+            pie = y + pies[s]  # (nivel, desde)
+            if s:
+                libres = _ensanchar(libres) & completo
+                lo, hi = bandas[s]
+                atrapa = (relativa >= lo) & (relativa <= hi) & puede_atrapar[:, None, :]
+                # Solo las ternas (nivel, desde, plataforma) en banda, en orden
+                # y agrupadas por (nivel, desde) como en el recorrido del juego
+                l, a, c = np.nonzero(atrapa)
+                if len(l):
+                    h = libres[l, a] & zonas[l, c]
+                    # Columnas atrapadas por más de una plataforma del grupo:
+                    # se recorren los grupos por turno (primera terna de
+                    # cada uno, luego la segunda...) como en analizar()
+                    nuevo = np.ones(len(l), bool)
+                    nuevo[1:] = (l[1:] != l[:-1]) | (a[1:] != a[:-1])
+                    vistos = np.zeros_like(libres)
+                    if nuevo.all():
+                        vistos[l, a] = h
+                        unicas = _alguno(h & ~cascada[l, c])
+                    else:
+                        inicio = np.flatnonzero(nuevo)
+                        turno = np.arange(len(l)) - inicio[np.cumsum(nuevo) - 1]
+                        repetidos = np.zeros_like(libres)
+                        for t in range(turno.max() + 1):
+                            k = turno == t
+                            repetidos[l[k], a[k]] |= vistos[l[k], a[k]] & h[k]
+                            vistos[l[k], a[k]] |= h[k]
+                        unicas = _alguno(h & ~repetidos[l, a] & ~cascada[l, c])
+                    aristas[l[unicas], a[unicas], c[unicas]] = True
+                    libres &= ~vistos
+            # Monedas a la altura del cuerpo que este vuelo aún no tocó
+            vertical = ((moneda_rel > pies[s] - ALTO_JUGADOR - ALTO_MONEDA) &
+                        (moneda_rel < pies[s]) & ~toques)
+            l, a, m = np.nonzero(vertical)
+            if len(l):
+                toques[l, a, m] |= _alguno(libres[l, a] & zonas_obj[l, m])
+            al_suelo = pie > SUELO
+            aristas[:, :, 0] |= al_suelo & _alguno(libres)
+            libres[al_suelo] = 0
+            if not libres.any():
+                break
+
+    # Cierre desde el suelo: como mucho una pasada por plataforma
+    alcanzadas = np.zeros_like(validas)
+    alcanzadas[:, 0] = True
+    for _ in range(n_plat + 1):
+        nuevas = alcanzadas | (alcanzadas[:, :, None] & aristas).any(axis=1)
+        if (nuevas == alcanzadas).all():
+            break
+        alcanzadas = nuevas
+    recogibles = (toques & alcanzadas[:, :, None]).any(axis=1)
+    return alcanzadas, recogibles
+
+
+def _validar_lote_lento(plataformas, monedas):
+    alcanzadas = []
+    recogibles = []
+    for plats, mons in zip(plataformas, monedas):
+        indices = [i for i, p in enumerate(plats) if p[2] > 0]
+        aristas, toques = analizar([plats[i] for i in indices],
+                                   [(mx, my, ANCHO_MONEDA, ALTO_MONEDA) for mx, my in mons])
+        vistas = _cierre(aristas)
+        fila = [False] * (len(plats) + 1)
+        fila[0] = True
+        for j, i in enumerate(indices, 1):
+            fila[i + 1] = j in vistas
+        alcanzadas.append(fila)
+        tocadas = set().union(*(toques[a] for a in vistas))
+        recogibles.append([m in tocadas for m in range(len(mons))])
+    return alcanzadas, recogibles
+
+
+def niveles_al_azar(rng, cantidad, n_plataformas=7, n_monedas=10):
+    # Niveles candidatos de una pantalla como los de crear_mundo:
+    # plataformas al azar y monedas sobre ellas
+    plataformas = []
+    monedas = []
+    for _ in range(cantidad):
+        plats = []
+        for _ in range(n_plataformas):
+            ancho = rng.randrange(80, 240, 10)
+            plats.append((rng.randrange(0, ANCHO - ancho, 10), rng.randrange(120, SUELO - 60, 10),
+                          ancho, 20))
+        mons = []
+        for _ in range(n_monedas):
+            x, y, ancho, _ = rng.choice(plats)
+            mons.append((rng.randint(x + 10, x + ancho - 30), y - 30))
+        plataformas.append(plats)
+        monedas.append(mons)
+    return plataformas, monedas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revisa que las monedas de un nivel se puedan recoger")
+    parser.add_argument('niveles', nargs='*', default=['normal', 'largo'],
+                        help="'normal', 'largo', un nivel .json o uno compilado .nivel")
+    parser.add_argument('--semillas', type=int, default=100,
+                        help="semillas a revisar por nivel (las monedas al azar cambian)")
+    parser.add_argument('--lote', type=int, metavar='NIVELES',
+                        help="medir cuántos niveles al azar por segundo se revisan")
+    args = parser.parse_args()
+
+    if args.lote:
+        plataformas, monedas = niveles_al_azar(random.Random(0), args.lote)
+        if np is None:
+            print("NumPy no está instalado, revisando los niveles de a uno...")
+        inicio = time.perf_counter()
+        _, recogibles = validar_lote(plataformas, monedas)
+        segundos = time.perf_counter() - inicio
+        validos = sum(all(r) for r in recogibles)
+        print(f"{args.lote} niveles en {segundos * 1000:.0f} ms "
+              f"({args.lote / segundos:.0f} por segundo), {validos} con todas las monedas alcanzables")
+        return
+
+    fallas = 0
+    for nombre in args.niveles:
+        generador = niveles.cargar(nombre)
+        malas = 0
+        for semilla in range(args.semillas):
+            plataformas, monedas, goombas, _, tortugas = generador(random.Random(semilla))
+            problemas = validar(plataformas, monedas, goombas, tortugas)
+            if problemas:
+                malas += 1
+                if malas <= 3:
+                    print(f"{nombre}, semilla {semilla}: " + "; ".join(problemas))
+        vistas = alcanzables(plataformas)
+        print(f"{nombre}: {len(vistas) - 1} de {len(plataformas)} plataformas alcanzables, "
+              f"{malas} de {args.semillas} semillas con problemas")
+        fallas += malas
+    if fallas:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
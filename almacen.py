@@ -0,0 +1,208 @@
+import itertools
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usan las clases normales
+    np = None
+
+from entidades import Tortuga
+
+# Almacén "struct of arrays" para Goombas y Tortugas. Las posiciones,
+# velocidades, direcciones, tamaños y banderas de vida viven en arreglos de
+# NumPy y la patrulla, la caída y la detección de choques con el jugador se
+# hacen en una sola operación por tick para todos los enemigos.
+#
+# Los enemigos se siguen usando como objetos (VistaEnemigo) que leen y
+# escriben su fila del almacén, así el renderizado y las colisiones con el
+# jugador no cambian.
+
+
+def disponible():
+    return np is not None
+
+
+def _campo(nombre, tipo):
+    def leer(self):
+        return tipo(getattr(self.almacen, nombre)[self.i])
+
+    def escribir(self, valor):
+        getattr(self.almacen, nombre)[self.i] = valor
+
+    return property(leer, escribir)
+
+
+# Atributos de Goomba y Tortuga que guarda el almacén
+CAMPOS = ('x', 'y', 'x_ant', 'y_ant', 'ancho', 'alto', 'velocidad', 'direccion',
+          'en_plataforma', 'vivo')
+
+
+class VistaEnemigo:
+    __slots__ = ('almacen', 'i', 'tipo')
+
+    def __init__(self, almacen, i, tipo):
+        self.almacen = almacen
+        self.i = i
+        self.tipo = tipo  # Clase original (Goomba o Tortuga)
+
+    x = _campo('x', float)
+    y = _campo('y', float)
+    x_ant = _campo('x_ant', float)
+    y_ant = _campo('y_ant', float)
+    ancho = _campo('ancho', int)
+    alto = _campo('alto', int)
+    velocidad = _campo('velocidad', float)
+    direccion = _campo('direccion', int)
+    en_plataforma = _campo('en_plataforma', bool)
+    vivo = _campo('vivo', bool)
+
+    def golpear(self):
+        self.vivo = False
+        return int(self.almacen.puntos[self.i])
+
+
+class AlmacenEnemigos:
+    def __init__(self, plataformas, capacidad=64):
+        self.px = np.array([p.x for p in plataformas], dtype=np.float64)
+        self.py = np.array([p.y for p in plataformas], dtype=np.float64)
+        self.pw = np.array([p.width for p in plataformas], dtype=np.float64)
+
+        self.n = 0          # Filas usadas (incluye huecos libres)
+        self.libres = []    # Filas de enemigos eliminados, para reutilizar
+        self.vistas = []    # Vista de cada fila
+        self._orden = itertools.count()
+        self._reservar(capacidad)
+
+    def _reservar(self, capacidad):
+        viejos = getattr(self, 'x', None)
+        nuevos = {
+            'x': np.zeros(capacidad), 'y': np.zeros(capacidad),
+            'x_ant': np.zeros(capacidad), 'y_ant': np.zeros(capacidad),
+            'ancho': np.zeros(capacidad), 'alto': np.zeros(capacidad),
+            'velocidad': np.zeros(capacidad),
+            'direccion': np.zeros(capacidad, dtype=np.int8),
+            'en_plataforma': np.zeros(capacidad, dtype=bool),
+            'vivo': np.zeros(capacidad, dtype=bool),
+            'puntos': np.zeros(capacidad, dtype=np.int32),
+            'es_goomba': np.zeros(capacidad, dtype=bool),
+            'orden': np.zeros(capacidad, dtype=np.int64),
+        }
+        if viejos is not None:
+            for nombre, arreglo in nuevos.items():
+                arreglo[:self.n] = getattr(self, nombre)[:self.n]
+        for nombre, arreglo in nuevos.items():
+            setattr(self, nombre, arreglo)
+        self.capacidad = capacidad
+
+    def agregar(self, enemigo):
+        # Copia un Goomba o Tortuga al almacén y devuelve su vista
+        if self.libres:
+            i = self.libres.pop()
+        else:
+            if self.n == self.capacidad:
+                self._reservar(self.capacidad * 2)
+            i = self.n
+            self.n += 1
+            self.vistas.append(None)
+        self.x[i] = self.x_ant[i] = enemigo.x
+        self.y[i] = self.y_ant[i] = enemigo.y
+        self.ancho[i] = enemigo.ancho
+        self.alto[i] = enemigo.alto
+        self.velocidad[i] = enemigo.velocidad
+        self.direccion[i] = enemigo.direccion
+        self.en_plataforma[i] = enemigo.en_plataforma
+        self.vivo[i] = True
+        self.puntos[i] = enemigo.puntos
+        self.es_goomba[i] = not isinstance(enemigo, Tortuga)
+        self.orden[i] = next(self._orden)
+        # La vista de una fila reutilizada también se reutiliza
+        vista = self.vistas[i]
+        if vista is None:
+            vista = self.vistas[i] = VistaEnemigo(self, i, type(enemigo))
+        else:
+            vista.tipo = type(enemigo)
+        return vista
+
+    def sacar(self, vista):
+        # Quita el enemigo y lo devuelve como objeto normal (Goomba o Tortuga)
+        enemigo = vista.tipo.__new__(vista.tipo)
+        for campo in CAMPOS:
+            setattr(enemigo, campo, getattr(vista, campo))
+        enemigo.apoyo = enemigo.dormido = None
+        self.quitar(vista)
+        return enemigo
+
+    def quitar(self, vista):
+        self.vivo[vista.i] = False
+        self.libres.append(vista.i)
+
+    def guardar_posiciones(self):
+        n = self.n
+        self.x_ant[:n] = self.x[:n]
+        self.y_ant[:n] = self.y[:n]
+
+    def mover(self, dt=1.0):
+        # Misma patrulla que Enemigo.mover, para todos los vivos a la vez
+        vivos = np.flatnonzero(self.vivo[:self.n])
+        if not len(vivos):
+            return
+        x = self.x[vivos]
+        y = self.y[vivos]
+        ancho = self.ancho[vivos]
+        alto = self.alto[vivos]
+        direccion = self.direccion[vivos]
+        px, py, pw = self.px, self.py, self.pw
+
+        # Movimiento horizontal
+        x += direccion * self.velocidad[vivos] * dt
+
+        # Plataforma de apoyo (matriz enemigos x plataformas)
+        pie = (y + alto)[:, None]
+        izq = x[:, None]
+        der = (x + ancho)[:, None]
+        solapa = (der > px) & (izq < px + pw)
+        sobre = (pie >= py - 5) & (pie <= py + 20) & solapa
+        en_plataforma = sobre.any(axis=1)
+
+        # Cambia dirección si llega al borde de alguna plataforma de apoyo
+        # (el bucle original hace break tras el primer cambio)
+        borde = sobre & (((direccion < 0)[:, None] & (izq <= px + 5)) |
+                         ((direccion > 0)[:, None] & (der >= px + pw - 5)))
+        direccion[borde.any(axis=1)] *= -1
+
+        # Gravedad solo si no está en plataforma: cae y se apoya en la primera
+        # plataforma cuyo borde superior cruzó al caer (la más alta), con el
+        # mismo margen de 5 px de la detección de apoyo
+        cayendo = np.flatnonzero(~en_plataforma)
+        if len(cayendo):
+            pie_antes = (y[cayendo] + alto[cayendo])[:, None]
+            y[cayendo] += 5 * dt
+            pie = (y[cayendo] + alto[cayendo] + 5)[:, None]
+            cruza = (pie_antes <= py) & (py <= pie) & solapa[cayendo]
+            apoyados = cruza.any(axis=1)
+            primera = np.where(cruza, py, np.inf).argmin(axis=1)[apoyados]
+            filas = cayendo[apoyados]
+            y[filas] = py[primera] - alto[filas]
+            en_plataforma[filas] = True
+
+        self.x[vivos] = x
+        self.y[vivos] = y
+        self.direccion[vivos] = direccion
+        self.en_plataforma[vivos] = en_plataforma
+
+    def cerca_de(self, entidad, margen=0):
+        # Enemigos vivos cuya caja toca la de la entidad ensanchada en margen,
+        # primero las tortugas y luego los goombas, cada grupo en orden de
+        # aparición (el mismo orden en que el juego resuelve los choques)
+        n = self.n
+        x = self.x[:n]
+        y = self.y[:n]
+        toca = (self.vivo[:n] &
+                (entidad.x - margen < x + self.ancho[:n]) &
+                (entidad.x + entidad.ancho + margen > x) &
+                (entidad.y < y + self.alto[:n]) &
+                (entidad.y + entidad.alto > y))
+        filas = np.flatnonzero(toca)
+        if len(filas) > 1:
+            filas = filas[np.lexsort((self.orden[filas], self.es_goomba[filas]))]
+        vistas = self.vistas
+        return [vistas[i] for i in filas]
@@ -0,0 +1,118 @@
+import pygame
+
+from recursos import SONIDOS, SonidoStreaming
+
+# Sonido del cliente con ventana.
+#
+# - preparar() ajusta el mezclador antes de pygame.init(): un búfer de 512
+#   muestras a 44,1 kHz son unos 12 ms, menos de un cuadro, así que un sonido
+#   que se pide en un tick empieza a oírse antes del cuadro siguiente (el
+#   búfer por defecto de pygame es de 4096 muestras, casi 100 ms).
+# - Audio reserva sus propios canales y los reparte según la prioridad y
+#   el máximo de voces de cada sonido: una ráfaga de monedas no acapara los
+#   canales ni se amontona, y un sonido importante le quita el canal al
+#   más viejo de menor prioridad.
+# - Los sonidos largos (SONIDOS con streaming) suenan desde disco con
+#   pygame.mixer.music y no ocupan memoria decodificados.
+# - AudioNulo tiene la misma interfaz y no hace nada: se usa sin dispositivo
+#   de sonido o con --sin-sonido, por ejemplo en corridas sin ventana.
+
+FRECUENCIA = 44100
+MUESTRAS_BUFFER = 512
+CANALES = 8
+
+# nombre -> (prioridad, voces a la vez)
+VOCES = {
+    'moneda': (1, 2),
+    'pisar': (2, 2),
+    'game_over': (3, 1),
+}
+
+
+def preparar():
+    # Llamar antes de pygame.init()
+    pygame.mixer.pre_init(FRECUENCIA, -16, 2, MUESTRAS_BUFFER)
+
+
+def crear_audio(recursos, activo=True):
+    # Audio si hay mezclador, o AudioNulo si no hay dispositivo de sonido
+    if activo and pygame.mixer.get_init() is None:
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            print("No hay dispositivo de sonido, jugando sin sonido...")
+            activo = False
+    return Audio(recursos) if activo else AudioNulo()
+
+
+class AudioNulo:
+    def precargar(self):
+        pass
+
+    def reproducir(self, nombre):
+        pass
+
+    def detener(self):
+        pass
+
+
+class Audio:
+    def __init__(self, recursos, canales=CANALES):
+        self.recursos = recursos
+        pygame.mixer.set_num_channels(canales)
+        # Reservados: Sound.play() de cualquier otra parte no los toma
+        pygame.mixer.set_reserved(canales)
+        self.canales = [pygame.mixer.Channel(i) for i in range(canales)]
+        # Por canal: (nombre, prioridad, orden) de lo último que sonó en él
+        self.ocupados = [None] * canales
+        self.orden = 0
+
+    def precargar(self):
+        # Decodifica los sonidos cortos antes de jugar, para que el primero
+        # no se retrase leyendo el archivo
+        for nombre in SONIDOS:
+            self.recursos.sonido(nombre)
+
+    def _elegir_canal(self, nombre, prioridad, voces):
+        # Índice del canal para el sonido, o None si no debe sonar
+        libre = None
+        propios = []   # canales sonando este mismo sonido
+        robables = []  # canales con sonidos de prioridad menor o igual
+        for i, canal in enumerate(self.canales):
+            ocupado = self.ocupados[i]
+            if ocupado is None or not canal.get_busy():
+                if libre is None:
+                    libre = i
+                continue
+            if ocupado[0] == nombre:
+                propios.append(i)
+            if ocupado[1] <= prioridad:
+                robables.append(i)
+        # Con todas las voces ocupadas se reinicia la más vieja
+        if len(propios) >= voces:
+            return min(propios, key=lambda i: self.ocupados[i][2])
+        if libre is not None:
+            return libre
+        if robables:
+            return min(robables, key=lambda i: self.ocupados[i][1:])
+        return None
+
+    def reproducir(self, nombre):
+        sonido = self.recursos.sonido(nombre)
+        if sonido is None:
+            return
+        if isinstance(sonido, SonidoStreaming):
+            sonido.play()
+            return
+        prioridad, voces = VOCES.get(nombre, (0, 1))
+        i = self._elegir_canal(nombre, prioridad, voces)
+        if i is None:
+            return
+        self.orden += 1
+        self.ocupados[i] = (nombre, prioridad, self.orden)
+        self.canales[i].play(sonido)
+
+    def detener(self):
+        for canal in self.canales:
+            canal.stop()
+        pygame.mixer.music.stop()
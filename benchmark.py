@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from constantes import ANCHO, ALTO
+from entidades import Goomba, Tortuga, Estrella
+from juego import Juego, crear_mundo
+
+# Banco de pruebas de rendimiento con escenarios sintéticos.
+#
+# Cada escenario corre sin ventana durante un número fijo de ticks, con
+# entradas pseudoaleatorias fijas, y mide por separado la actualización
+# (Juego.step) y el dibujo (Renderizador.dibujar sobre una superficie fuera
+# de pantalla). La memoria pico se mide en una pasada aparte más corta con
+# tracemalloc, para no distorsionar los tiempos.
+#
+# Uso:
+#   python benchmark.py --salida resultados.json
+#   python benchmark.py --comparar base.json --umbral 0.15
+
+
+# Generadores de mundos (misma firma que crear_mundo)
+
+def _sobre(rng, plataforma, ancho):
+    return rng.randint(plataforma.x, plataforma.x + plataforma.width - ancho)
+
+
+def mundo_goombas(cantidad):
+    def generar(rng):
+        plataformas, monedas, goombas, hongos, tortugas = crear_mundo(rng)
+        for _ in range(cantidad):
+            p = rng.choice(plataformas[1:])
+            goombas.append(Goomba(_sobre(rng, p, 40), p.y - 40))
+        return plataformas, monedas, goombas, hongos, tortugas
+    return generar
+
+
+def mundo_tortugas(cantidad):
+    def generar(rng):
+        plataformas, monedas, goombas, hongos, tortugas = crear_mundo(rng)
+        for _ in range(cantidad):
+            tortugas.append(Tortuga(rng.randint(0, ANCHO - 50), ALTO - 100, rng.choice((-1, 1))))
+        return plataformas, monedas, goombas, hongos, tortugas
+    return generar
+
+
+def mundo_plataformas(cantidad, ancho_mundo=20000):
+    def generar(rng):
+        plataformas = [pygame.Rect(0, ALTO - 50, ancho_mundo, 50)]
+        for _ in range(cantidad):
+            plataformas.append(pygame.Rect(rng.randint(0, ancho_mundo - 200), rng.randint(100, 480),
+                                           rng.randint(100, 200), 20))
+        monedas = []
+        goombas = []
+        for p in plataformas[1::2]:
+            goombas.append(Goomba(_sobre(rng, p, 40), p.y - 40))
+            monedas.append(Estrella(_sobre(rng, p, 30), p.y - 30))
+        return plataformas, monedas, goombas, [], []
+    return generar
+
+
+def mundo_monedas(cantidad):
+    def generar(rng):
+        plataformas, monedas, goombas, hongos, tortugas = crear_mundo(rng)
+        for _ in range(cantidad):
+            p = rng.choice(plataformas)
+            monedas.append(Estrella(_sobre(rng, p, 30), p.y - 30))
+        return plataformas, monedas, goombas, hongos, tortugas
+    return generar
+
+
+# nombre -> (generador, max_tortugas)
+ESCENARIOS = {
+    'estandar': (crear_mundo, 4),
+    'goombas_1k': (mundo_goombas(1000), 4),
+    'tortugas_300': (mundo_tortugas(300), 400),
+    'plataformas_400': (mundo_plataformas(400), 4),
+    'monedas_5k': (mundo_monedas(5000), 4),
+}
+
+
+def crear_juego(nombre, semilla, vectorizado):
+    generador, max_tortugas = ESCENARIOS[nombre]
+    juego = Juego(vectorizado=vectorizado, semilla=semilla, generador=generador)
+    juego.max_tortugas = max_tortugas
+    return juego
+
+
+def entradas_guion(semilla, ticks):
+    # Mismas entradas en cada corrida: cambian cada 20 ticks
+    rng = random.Random(semilla)
+    entradas = []
+    actual = 0
+    for i in range(ticks):
+        if i % 20 == 0:
+            actual = rng.randrange(16)
+        entradas.append(actual)
+    return entradas
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(nombre, ticks, semilla=1, vectorizado=False, renderizador=None):
+    juego = crear_juego(nombre, semilla, vectorizado)
+    entradas = entradas_guion(semilla, ticks)
+    reloj = time.perf_counter_ns
+    tiempos = []
+    dibujo = []
+    step = juego.step
+    for e in entradas:
+        inicio = reloj()
+        step(e)
+        tiempos.append(reloj() - inicio)
+        if renderizador:
+            inicio = reloj()
+            renderizador.dibujar(juego)
+            dibujo.append(reloj() - inicio)
+
+    tiempos.sort()
+    dibujo.sort()
+    total = sum(tiempos) / 1e9
+    resultado = {
+        'ticks': ticks,
+        'ticks_por_seg': ticks / total if total else 0.0,
+        'tick_p50_ms': percentil(tiempos, 0.50) / 1e6,
+        'tick_p95_ms': percentil(tiempos, 0.95) / 1e6,
+        'tick_p99_ms': percentil(tiempos, 0.99) / 1e6,
+        'actualizar_ms': total * 1000 / ticks,
+    }
+    if dibujo:
+        resultado['dibujar_ms'] = sum(dibujo) / len(dibujo) / 1e6
+        resultado['dibujar_p95_ms'] = percentil(dibujo, 0.95) / 1e6
+    return resultado
+
+
+def memoria_pico(nombre, ticks, semilla=1, vectorizado=False):
+    # Bytes pico asignados por Python al crear el mundo y correr unos ticks
+    tracemalloc.start()
+    try:
+        juego = crear_juego(nombre, semilla, vectorizado)
+        for e in entradas_guion(semilla, ticks):
+            juego.step(e)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Métricas en las que un valor mayor es peor
+PEOR_SI_SUBE = ('tick_p50_ms', 'tick_p95_ms', 'tick_p99_ms', 'actualizar_ms',
+                'dibujar_ms', 'dibujar_p95_ms', 'memoria_pico_kb')
+
+
+def comparar(resultados, base, umbral):
+    # Devuelve la lista de regresiones mayores que umbral (fracción)
+    regresiones = []
+    for nombre, metricas in resultados['escenarios'].items():
+        anterior = base.get('escenarios', {}).get(nombre)
+        if not anterior:
+            continue
+        for metrica, valor in metricas.items():
+            viejo = anterior.get(metrica)
+            if not viejo:
+                continue
+            if metrica == 'ticks_por_seg':
+                cambio = (viejo - valor) / viejo
+            elif metrica in PEOR_SI_SUBE:
+                cambio = (valor - viejo) / viejo
+            else:
+                continue
+            if cambio > umbral:
+                regresiones.append((nombre, metrica, viejo, valor, cambio))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento")
+    parser.add_argument('--escenarios', nargs='+', choices=sorted(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument('--ticks', type=int, default=1200)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--vectorizado', action='store_true')
+    parser.add_argument('--sin-dibujo', action='store_true', help="medir solo la actualización")
+    parser.add_argument('--salida', help="guardar los resultados en este JSON")
+    parser.add_argument('--comparar', metavar='BASE', help="JSON de referencia para detectar regresiones")
+    parser.add_argument('--umbral', type=float, default=0.10,
+                        help="regresión máxima tolerada (fracción, por defecto %(default)s)")
+    args = parser.parse_args()
+
+    renderizador = None
+    if not args.sin_dibujo:
+        from render import Renderizador
+        pygame.init()
+        pygame.display.set_mode((ANCHO, ALTO))
+        renderizador = Renderizador(pygame.Surface((ANCHO, ALTO)))
+
+    resultados = {
+        'python': sys.version.split()[0],
+        'plataforma': platform.platform(),
+        'pygame': pygame.version.ver,
+        'ticks': args.ticks,
+        'vectorizado': args.vectorizado,
+        'escenarios': {},
+    }
+    print(f"{'escenario':<16} {'ticks/s':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'dibujo ms':>9} {'mem KB':>8}")
+    for nombre in args.escenarios:
+        r = medir(nombre, args.ticks, args.semilla, args.vectorizado, renderizador)
+        r['memoria_pico_kb'] = memoria_pico(nombre, min(args.ticks, 200), args.semilla,
+                                            args.vectorizado) / 1024
+        resultados['escenarios'][nombre] = r
+        print(f"{nombre:<16} {r['ticks_por_seg']:>9.0f} {r['tick_p50_ms']:>7.3f} "
+              f"{r['tick_p95_ms']:>7.3f} {r['tick_p99_ms']:>7.3f} "
+              f"{r.get('dibujar_ms', 0):>9.3f} {r['memoria_pico_kb']:>8.0f}")
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(resultados, f, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.umbral)
+        for nombre, metrica, viejo, nuevo, cambio in regresiones:
+            print(f"REGRESIÓN {nombre}.{metrica}: {viejo:.3f} -> {nuevo:.3f} ({cambio:+.0%})")
+        if regresiones:
+            sys.exit(1)
+        print(f"Sin regresiones mayores al {args.umbral:.0%}")
+
+
+if __name__ == "__main__":
+    main()
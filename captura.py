@@ -0,0 +1,210 @@
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # Sin NumPy el XOR entre cuadros se hace con enteros de Python
+    np = None
+
+import pygame
+
+# Captura de partidas para QA y soporte.
+#
+# Capturadora.capturar(pantalla) se llama después de dibujar cada cuadro:
+# copia los píxeles desde la vista del búfer de la pantalla a uno de unos
+# pocos huecos reservados al empezar (una copia de memoria, sin crear
+# objetos nuevos por cuadro) y deja su índice en una cola. Un hilo
+# codificador los comprime y los escribe en el archivo:
+# - Cada cuadro se guarda como XOR con el anterior, casi todo ceros, que
+#   zlib comprime muy bien; cada CADA_CLAVE cuadros va uno completo.
+# - Con cada=N solo se captura uno de cada N cuadros dibujados.
+# - Si el codificador se atrasa y no queda ningún hueco libre, el cuadro
+#   se descarta: el bucle del juego nunca espera al codificador.
+# zlib y NumPy sueltan el GIL mientras trabajan, así que el hilo solo le
+# quita al juego el tiempo de CPU que usa.
+#
+# Uso:  python captura.py partida.cap            (resumen)
+#       python captura.py partida.cap --png DIR  (un PNG por cuadro)
+
+FIRMA = b'MCAP'
+VERSION = 1
+_CABECERA = struct.Struct('<4sBHHH4I')  # firma, versión, ancho, alto, pitch, máscaras RGBA
+_CUADRO = struct.Struct('<IIBI')        # tick, milisegundos, completo, bytes comprimidos
+
+HUECOS = 4
+CADA_CLAVE = 120
+NIVEL_ZLIB = 1  # El más rápido: con el XOR ya casi todo son ceros
+
+
+def _xor(a, b):
+    if np is not None:
+        return np.bitwise_xor(np.frombuffer(a, np.uint8), np.frombuffer(b, np.uint8)).tobytes()
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+class Capturadora:
+    def __init__(self, ruta, pantalla, cada=1, huecos=HUECOS, cada_clave=CADA_CLAVE):
+        if pantalla.get_bytesize() != 4:
+            raise ValueError("la captura necesita una pantalla de 32 bits")
+        ancho, alto = pantalla.get_size()
+        self.tamano = pantalla.get_pitch() * alto
+        self.cada = max(1, cada)
+        self.cada_clave = cada_clave
+        self.archivo = open(ruta, 'wb')
+        self.archivo.write(_CABECERA.pack(FIRMA, VERSION, ancho, alto, pantalla.get_pitch(),
+                                          *pantalla.get_masks()))
+        self.huecos = [bytearray(self.tamano) for _ in range(huecos)]
+        self.libres = queue.Queue()
+        for i in range(huecos):
+            self.libres.put(i)
+        self.pendientes = queue.Queue()
+        self.dibujados = 0
+        self.descartados = 0
+        self.escritos = 0
+        self.bytes = 0
+        self.inicio = time.perf_counter()
+        self.hilo = threading.Thread(target=self._codificar, daemon=True)
+        self.hilo.start()
+
+    def capturar(self, pantalla, tick=0):
+        self.dibujados += 1
+        if (self.dibujados - 1) % self.cada:
+            return
+        try:
+            i = self.libres.get_nowait()
+        except queue.Empty:
+            self.descartados += 1
+            return
+        self.huecos[i][:] = pantalla.get_view('0')
+        ms = int((time.perf_counter() - self.inicio) * 1000)
+        self.pendientes.put((i, tick, ms))
+
+    def _codificar(self):
+        # Hilo codificador. El hueco se libera en cuanto su cuadro pasa a
+        # previo, antes de comprimir
+        previo = bytearray(self.tamano)
+        if np is not None:
+            previo_np = np.frombuffer(previo, np.uint8)
+            delta = np.empty(self.tamano, np.uint8)
+            huecos_np = [np.frombuffer(h, np.uint8) for h in self.huecos]
+        while True:
+            elemento = self.pendientes.get()
+            if elemento is None:
+                return
+            i, tick, ms = elemento
+            completo = self.escritos % self.cada_clave == 0
+            if completo:
+                previo[:] = self.huecos[i]
+                self.libres.put(i)
+                datos = zlib.compress(previo, NIVEL_ZLIB)
+            else:
+                if np is not None:
+                    np.bitwise_xor(huecos_np[i], previo_np, out=delta)
+                else:
+                    delta = _xor(self.huecos[i], previo)
+                previo[:] = self.huecos[i]
+                self.libres.put(i)
+                datos = zlib.compress(delta, NIVEL_ZLIB)
+            self.archivo.write(_CUADRO.pack(tick, ms, completo, len(datos)))
+            self.archivo.write(datos)
+            self.escritos += 1
+            self.bytes += _CUADRO.size + len(datos)
+
+    def cerrar(self):
+        # Espera a que se escriban los cuadros pendientes
+        self.pendientes.put(None)
+        self.hilo.join()
+        self.archivo.close()
+
+    def resumen(self):
+        return (f"Captura: {self.escritos} cuadros ({self.descartados} descartados), "
+                f"{self.bytes / 1024 / 1024:.1f} MB, "
+                f"{self.bytes / max(1, self.escritos) / 1024:.1f} KB por cuadro")
+
+
+# Lectura
+
+def leer(ruta):
+    # Devuelve (cabecera, cuadros); cuadros va leyendo el archivo y da
+    # (tick, milisegundos, píxeles) de cada cuadro
+    archivo = open(ruta, 'rb')
+    datos = archivo.read(_CABECERA.size)
+    if len(datos) < _CABECERA.size:
+        archivo.close()
+        raise ValueError(f"{ruta} no es una captura válida")
+    firma, version, ancho, alto, pitch, *mascaras = _CABECERA.unpack(datos)
+    if firma != FIRMA or version != VERSION:
+        archivo.close()
+        raise ValueError(f"{ruta} no es una captura válida")
+    cabecera = {'ancho': ancho, 'alto': alto, 'pitch': pitch, 'mascaras': mascaras}
+    return cabecera, _cuadros(archivo)
+
+
+def _cuadros(archivo):
+    with archivo:
+        previo = None
+        while True:
+            datos = archivo.read(_CUADRO.size)
+            if len(datos) < _CUADRO.size:
+                return
+            tick, ms, completo, largo = _CUADRO.unpack(datos)
+            datos = archivo.read(largo)
+            if len(datos) < largo:
+                return  # Captura cortada (el juego no se cerró bien)
+            pixeles = zlib.decompress(datos)
+            if not completo:
+                pixeles = _xor(pixeles, previo)
+            previo = pixeles
+            yield tick, ms, pixeles
+
+
+def superficie(cabecera, pixeles):
+    # Superficie de pygame con los píxeles de un cuadro
+    ancho, alto, pitch = cabecera['ancho'], cabecera['alto'], cabecera['pitch']
+    resultado = pygame.Surface((ancho, alto), 0, 32, cabecera['mascaras'])
+    bufer = resultado.get_buffer()
+    if resultado.get_pitch() == pitch:
+        bufer.write(pixeles)
+    else:
+        fila = ancho * 4
+        for y in range(alto):
+            bufer.write(pixeles[y * pitch:y * pitch + fila], y * resultado.get_pitch())
+    del bufer
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen o exportación de una captura")
+    parser.add_argument('archivo')
+    parser.add_argument('--png', metavar='CARPETA', help="guardar cada cuadro como PNG")
+    args = parser.parse_args()
+
+    cabecera, cuadros = leer(args.archivo)
+    if args.png:
+        os.makedirs(args.png, exist_ok=True)
+    total = 0
+    primero = ultimo = 0
+    for tick, ms, pixeles in cuadros:
+        if total == 0:
+            primero = ms
+        ultimo = ms
+        if args.png:
+            pygame.image.save(superficie(cabecera, pixeles),
+                              os.path.join(args.png, f'cuadro_{total:05d}.png'))
+        total += 1
+    segundos = (ultimo - primero) / 1000
+    tamano = os.path.getsize(args.archivo)
+    print(f"{args.archivo}: {cabecera['ancho']}x{cabecera['alto']}, {total} cuadros en "
+          f"{segundos:.1f} s ({total / segundos if segundos else 0:.1f} por segundo), "
+          f"{tamano / 1024 / 1024:.1f} MB")
+    if args.png:
+        print(f"{total} PNG guardados en {args.png}")
+
+
+if __name__ == "__main__":
+    main()
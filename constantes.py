@@ -0,0 +1,23 @@
+# Constantes compartidas entre la simulación y el renderizado
+
+ANCHO, ALTO = 800, 600
+FPS = 60
+
+# Colores
+NEGRO = (0, 0, 0)
+BLANCO = (255, 255, 255)
+ROJO = (255, 0, 0)
+VERDE = (0, 255, 0)
+AZUL = (100, 100, 255)
+AMARILLO = (255, 255, 0)
+MARRON = (139, 69, 19)
+GRIS = (150, 150, 150)
+MARRON_PLATAFORMA = (139, 69, 19)
+VERDE_HIERBA = (34, 139, 34)
+
+# Entradas del jugador (máscara de bits, independiente del teclado)
+IZQUIERDA = 1
+DERECHA = 2
+SALTAR = 4
+BAJAR = 8
+REINICIAR = 16
@@ -0,0 +1,360 @@
+from math import ceil
+
+from constantes import ALTO, IZQUIERDA, DERECHA, SALTAR, BAJAR
+
+# Lógica de las entidades. No dibujan ni dependen de la pantalla: el dibujo
+# vive en render.py para que la simulación pueda correr sin ventana.
+#
+# Todas usan __slots__: sin __dict__ por objeto ocupan menos memoria y los
+# atributos se leen más rápido en los bucles de cada tick.
+
+# Física del jugador, en píxeles por cuadro de 60 Hz (alcance.py calcula con
+# ellas hasta dónde llega un salto)
+VELOCIDAD_JUGADOR = 5
+VELOCIDAD_SALTO = -15
+GRAVEDAD = 0.8
+
+
+class Entidad:
+    __slots__ = ('x', 'y', 'x_ant', 'y_ant')
+
+    def guardar_posicion(self):
+        # Posición al inicio del tick, para interpolar el dibujo entre ticks
+        self.x_ant = self.x
+        self.y_ant = self.y
+
+
+# Jugador (Mario)
+class Jugador(Entidad):
+    __slots__ = ('ancho', 'alto', 'vel_x', 'vel_y', 'saltando', 'vidas', 'direccion',
+                 'invencible', 'tiempo_invencible', 'grande', 'cayendo_activo')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.ancho = 40
+        self.alto = 60
+        self.vel_x = 0
+        self.vel_y = 0
+        self.saltando = False
+        self.vidas = 3
+        self.direccion = 1
+        self.invencible = False
+        self.tiempo_invencible = 0
+        self.grande = False
+        self.cayendo_activo = False  # Nuevo atributo para controlar la caída
+        self.guardar_posicion()
+
+    # Las velocidades están en píxeles por cuadro de 60 Hz; dt escala cada
+    # tick a esa unidad (dt=0.5 con física a 120 Hz).
+    def mover(self, entradas, dt=1.0):
+        self.vel_x = 0
+        if entradas & IZQUIERDA:
+            self.vel_x = -VELOCIDAD_JUGADOR
+            self.direccion = -1
+        if entradas & DERECHA:
+            self.vel_x = VELOCIDAD_JUGADOR
+            self.direccion = 1
+        self.x += self.vel_x * dt
+
+        # Permitir caer a través de plataformas presionando abajo (S)
+        if entradas & BAJAR and not self.saltando:
+            self.cayendo_activo = True
+            self.saltando = True
+            self.y += 2  # Pequeño empujón hacia abajo
+
+        if entradas & SALTAR and not self.saltando:
+            self.vel_y = VELOCIDAD_SALTO
+            self.saltando = True
+            self.cayendo_activo = False
+
+    def gravedad(self, rejilla, dt=1.0):
+        pie_antes = self.y + self.alto
+        self.vel_y += GRAVEDAD * dt
+        self.y += self.vel_y * dt
+
+        # Colisión con plataformas (solo si no estamos en modo caída activo)
+        en_plataforma = False
+        if not self.cayendo_activo:
+            # Banda de 40 px: al aterrizar, y sube hasta 20 px y el bucle sigue
+            # comparando con las plataformas siguientes. La consulta cubre
+            # también todo el recorrido de los pies en este tick.
+            pie = self.y + self.alto
+            desde = min(pie - 40, pie_antes)
+            plataformas = rejilla.plataformas_en(self.x, desde, self.ancho, pie - desde)
+
+            # Colisión continua: si en este tick los pies cruzaron el borde
+            # superior de una plataforma que queda por encima de la banda
+            # (caída de más de 20 px por tick: dt grande o mucha velocidad),
+            # se aterriza en la primera que cruzaron en lugar de atravesarla
+            impacto = None
+            if pie - pie_antes > 20:
+                impacto = barrido(plataformas, self.x, self.ancho, pie_antes, pie)
+            if impacto is not None and impacto.y < pie - 20:
+                self.aterrizar(impacto)
+                en_plataforma = True
+            else:
+                for plataforma in plataformas:
+                    if (self.y + self.alto >= plataforma.y and
+                        self.y + self.alto <= plataforma.y + 20 and
+                        self.x + self.ancho > plataforma.x and
+                        self.x < plataforma.x + plataforma.width):
+
+                        self.aterrizar(plataforma)
+                        en_plataforma = True
+
+        # Colisión con el suelo principal
+        if not en_plataforma and self.y + self.alto > ALTO - 50:
+            self.y = ALTO - 50 - self.alto
+            self.vel_y = 0
+            self.saltando = False
+            self.cayendo_activo = False
+
+    def aterrizar(self, plataforma):
+        self.y = plataforma.y - self.alto
+        self.vel_y = 0
+        self.saltando = False
+        self.cayendo_activo = False
+
+    def actualizar_invencibilidad(self, dt=1.0):
+        if self.invencible:
+            self.tiempo_invencible -= dt
+            if self.tiempo_invencible <= 0:
+                self.invencible = False
+
+    def hacer_invencible(self, tiempo):
+        self.invencible = True
+        self.tiempo_invencible = tiempo
+
+    def hacer_grande(self):
+        self.grande = True
+        self.ancho = int(self.ancho * 1.3)
+        self.alto = int(self.alto * 1.3)
+
+
+class Enemigo(Entidad):
+    # Patrulla compartida por Goomba y Tortuga: camina sobre su plataforma,
+    # da la vuelta en los bordes y cae si no tiene plataforma debajo.
+    #
+    # apoyo es el contacto persistente: la plataforma en la que está parado,
+    # si ninguna otra puede tocarlo a la vez (RejillaEspacial.aislada).
+    # Mientras siga encima no hace falta consultar la rejilla. dormido es el
+    # tick desde el que el Juego dejó de moverlo (None si está despierto).
+    __slots__ = ('ancho', 'alto', 'velocidad', 'vivo', 'direccion', 'en_plataforma',
+                 'apoyo', 'dormido')
+
+    def mover(self, rejilla, dt=1.0):
+        # Movimiento horizontal
+        self.x += self.direccion * self.velocidad * dt
+        pie = self.y + self.alto
+
+        apoyo = self.apoyo
+        if apoyo is not None:
+            if (pie >= apoyo.y - 5 and pie <= apoyo.y + 20 and
+                self.x + self.ancho > apoyo.x and self.x < apoyo.x + apoyo.width):
+                if (self.direccion < 0 and self.x <= apoyo.x + 5) or \
+                   (self.direccion > 0 and self.x + self.ancho >= apoyo.x + apoyo.width - 5):
+                    self.direccion *= -1
+                return
+            self.apoyo = None  # Salió de su plataforma: consulta completa
+
+        # Detección de bordes mejorada
+        self.en_plataforma = False
+        for plataforma in rejilla.plataformas_en(self.x, pie - 20, self.ancho, 25):
+            # Verifica si está sobre la plataforma
+            if (pie >= plataforma.y - 5 and  # Margen superior
+                pie <= plataforma.y + 20 and  # Margen inferior
+                self.x + self.ancho > plataforma.x and
+                self.x < plataforma.x + plataforma.width):
+
+                self.en_plataforma = True
+                if rejilla.aislada(plataforma, self.ancho):
+                    self.apoyo = plataforma
+
+                # Cambia dirección si golpea el borde
+                if (self.direccion < 0 and self.x <= plataforma.x + 5) or \
+                   (self.direccion > 0 and self.x + self.ancho >= plataforma.x + plataforma.width - 5):
+                    self.direccion *= -1
+                    break  # Evita cambios múltiples
+
+        # Gravedad solo si no está en plataforma: cae 5 px por cuadro y se
+        # apoya en la primera plataforma cuyo borde superior cruzó al caer
+        # (con el mismo margen de 5 px que la detección de arriba)
+        if not self.en_plataforma:
+            pie_antes = self.y + self.alto
+            self.y += 5 * dt
+            pie = self.y + self.alto + 5
+            plataformas = rejilla.plataformas_en(self.x, pie_antes, self.ancho, pie - pie_antes)
+            impacto = barrido(plataformas, self.x, self.ancho, pie_antes, pie)
+            if impacto is not None:
+                self.y = impacto.y - self.alto
+                self.en_plataforma = True
+
+    def puede_dormir(self, dt):
+        # La patrulla sobre el apoyo se puede calcular sin simularla si los
+        # pasos son exactos en coma flotante (múltiplos de 1/64) y el
+        # enemigo no puede salirse de la plataforma en un rebote
+        apoyo = self.apoyo
+        paso = self.velocidad * dt
+        if apoyo is None or paso <= 0 or not (paso * 64).is_integer() or not (self.x * 64).is_integer():
+            return False
+        izquierda = min(self.x, apoyo.x + 5) - paso
+        derecha = max(self.x, apoyo.x + apoyo.width - 5 - self.ancho) + paso
+        return izquierda + self.ancho > apoyo.x and derecha < apoyo.x + apoyo.width
+
+    def patrullar(self, ticks, dt):
+        # Avanza ticks de patrulla sobre el apoyo de una vez (ver patrulla())
+        apoyo = self.apoyo
+        self.x, self.direccion = patrulla(self.x, self.direccion, self.velocidad * dt,
+                                          apoyo.x + 5, apoyo.x + apoyo.width - 5,
+                                          self.ancho, ticks)
+
+
+def patrulla(x, direccion, paso, izquierda, derecha, ancho, ticks):
+    # Posición y dirección tras ticks de ida y vuelta entre los bordes, igual
+    # que tick a tick (paso exacto): se salta de rebote en rebote y, cuando
+    # el movimiento empieza a repetirse, se descartan las vueltas completas
+    vuelta = None
+    while ticks > 0:
+        if direccion > 0:
+            hasta_rebote = max(1, ceil((derecha - ancho - x) / paso))
+        else:
+            hasta_rebote = max(1, ceil((x - izquierda) / paso))
+        if hasta_rebote > ticks:
+            return x + direccion * ticks * paso, direccion
+        x += direccion * hasta_rebote * paso
+        ticks -= hasta_rebote
+        direccion = -direccion
+        if vuelta is None:
+            vuelta = (x, direccion, ticks)
+        elif (x, direccion) == vuelta[:2]:
+            ticks %= vuelta[2] - ticks
+            vuelta = None
+    return x, direccion
+
+
+class Goomba(Enemigo):
+    __slots__ = ()
+    puntos = 100  # Puntos por matar goomba
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.ancho = 40
+        self.alto = 40
+        self.velocidad = 1
+        self.vivo = True
+        self.direccion = -1  # Empieza moviéndose a la izquierda
+        self.en_plataforma = False
+        self.apoyo = None
+        self.dormido = None
+        self.guardar_posicion()
+
+    def golpear(self):
+        self.vivo = False
+        return self.puntos
+
+
+class Tortuga(Enemigo):
+    __slots__ = ()
+    puntos = 200  # Puntos por matar tortuga
+
+    def __init__(self, x, y, direccion):
+        self.x = x
+        self.y = y
+        self.ancho = 50
+        self.alto = 50
+        self.velocidad = 2
+        self.vivo = True
+        self.direccion = direccion  # 1 para derecha, -1 para izquierda
+        self.en_plataforma = False
+        self.apoyo = None
+        self.dormido = None
+        self.guardar_posicion()
+
+    def golpear(self):
+        # Ahora simplemente mata a la tortuga y da puntos
+        self.vivo = False
+        return self.puntos
+
+
+class Estrella(Entidad):
+    __slots__ = ('ancho', 'alto', 'recogida')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.ancho = 30
+        self.alto = 30
+        self.recogida = False
+        self.guardar_posicion()
+
+
+class Hongo(Entidad):
+    __slots__ = ('ancho', 'alto', 'recogido', 'direccion')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.ancho = 30
+        self.alto = 30
+        self.recogido = False
+        self.direccion = 1  # Se mueve a la derecha
+        self.guardar_posicion()
+
+    def mover(self, rejilla, dt=1.0):
+        self.x += self.direccion * 2 * dt
+
+        # Cambiar dirección en bordes
+        pie = self.y + self.alto
+        for plataforma in rejilla.plataformas_en(self.x, pie - 5, self.ancho, 5):
+            if (self.y + self.alto >= plataforma.y and
+                self.y + self.alto <= plataforma.y + 5 and
+                self.x + self.ancho > plataforma.x and
+                self.x < plataforma.x + plataforma.width):
+
+                if (self.direccion < 0 and self.x <= plataforma.x) or \
+                   (self.direccion > 0 and self.x + self.ancho >= plataforma.x + plataforma.width):
+                    self.direccion *= -1
+                    break
+
+
+class Reserva:
+    # Reserva (pool) de entidades de un tipo: las que mueren se devuelven y
+    # obtener() las vuelve a inicializar en lugar de crear objetos nuevos
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.libres = []
+
+    def obtener(self, *args):
+        if self.libres:
+            entidad = self.libres.pop()
+            entidad.__init__(*args)
+            return entidad
+        return self.tipo(*args)
+
+    def devolver(self, entidad):
+        self.libres.append(entidad)
+
+
+def barrido(plataformas, x, ancho, pie_antes, pie):
+    # Colisión continua de los pies contra los bordes superiores: de las
+    # plataformas que solapan en x y cuyo borde superior está entre la
+    # altura de los pies al empezar el tick y al terminarlo, devuelve la
+    # más alta (la primera que se toca al caer), o None
+    impacto = None
+    for plataforma in plataformas:
+        if (pie_antes <= plataforma.y <= pie and
+            x + ancho > plataforma.x and
+            x < plataforma.x + plataforma.width and
+            (impacto is None or plataforma.y < impacto.y)):
+            impacto = plataforma
+    return impacto
+
+
+def colisionan(a, b):
+    # Intersección AABB entre dos entidades con x, y, ancho y alto
+    return (a.x < b.x + b.ancho and
+            a.x + a.ancho > b.x and
+            a.y < b.y + b.alto and
+            a.y + a.alto > b.y)
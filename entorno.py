@@ -0,0 +1,263 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+try:
+    import numpy as np
+except ImportError:  # Sin NumPy las observaciones son listas
+    np = None
+
+from juego import Juego
+import niveles
+
+# Entorno por lotes para pruebas automáticas y entrenamiento de agentes.
+#
+# Entorno(n) avanza n partidas independientes sin ventana con la interfaz
+# reset() / step(acciones): las acciones son las máscaras de entradas de
+# cada partida y step devuelve (observaciones, recompensas, terminadas,
+# info). Una partida terminada (victoria, game over o max_ticks) se
+# reinicia sola y su resultado queda en info.
+#
+# EntornoParalelo reparte las partidas entre procesos (uno por núcleo)
+# que se quedan vivos entre pasos; cada partida usa la semilla
+# semilla + índice, así que el resultado no depende de cuántos procesos
+# haya. correr_episodios() es lo mismo para lotes completos de partidas
+# con una política fija.
+#
+# Uso:  python entorno.py --instancias 256 --ticks 2000
+
+# Columnas de cada fila de observaciones
+OBSERVACION = ('x', 'y', 'vel_x', 'vel_y', 'vidas', 'grande', 'invencible', 'puntaje',
+               'monedas', 'moneda_dx', 'moneda_dy', 'enemigo_dx', 'enemigo_dy',
+               'enemigos', 'victoria', 'game_over')
+
+
+def _mas_cercana(jugador, entidades):
+    # (dx, dy) a la entidad más cercana, o (0, 0) si no hay ninguna
+    mejor = None
+    mejor_d = 0
+    for e in entidades:
+        dx = e.x - jugador.x
+        dy = e.y - jugador.y
+        d = dx * dx + dy * dy
+        if mejor is None or d < mejor_d:
+            mejor = (dx, dy)
+            mejor_d = d
+    return mejor or (0, 0)
+
+
+def observar(juego):
+    juego.sincronizar()
+    j = juego.jugador
+    moneda = _mas_cercana(j, juego.monedas)
+    enemigo = _mas_cercana(j, juego.tortugas + juego.goombas)
+    return (j.x, j.y, j.vel_x, j.vel_y, j.vidas, j.grande, j.invencible, juego.puntaje,
+            len(juego.monedas) + juego.sectores.cantidad('monedas'), moneda[0], moneda[1],
+            enemigo[0], enemigo[1], len(juego.tortugas) + len(juego.goombas),
+            juego.victoria, juego.game_over)
+
+
+class Entorno:
+    def __init__(self, n, semilla=0, nivel='normal', max_ticks=3600, primero=0):
+        # primero: índice global de la primera partida (para las semillas)
+        generador = niveles.cargar(nivel)
+        self.juegos = [Juego(semilla=semilla + primero + i, generador=generador)
+                       for i in range(n)]
+        self.max_ticks = max_ticks
+        if np is not None:
+            self.observaciones = np.zeros((n, len(OBSERVACION)), dtype=np.float32)
+            self.recompensas = np.zeros(n, dtype=np.float32)
+            self.terminadas = np.zeros(n, dtype=bool)
+
+    def __len__(self):
+        return len(self.juegos)
+
+    def _observar(self):
+        if np is None:
+            return [observar(juego) for juego in self.juegos]
+        for i, juego in enumerate(self.juegos):
+            self.observaciones[i] = observar(juego)
+        return self.observaciones
+
+    def reset(self):
+        for juego in self.juegos:
+            juego.reiniciar()
+        return self._observar()
+
+    def step(self, acciones):
+        # acciones: una máscara de entradas por partida. La recompensa es el
+        # puntaje ganado en el paso. Los arreglos devueltos se reutilizan en
+        # el paso siguiente.
+        recompensas = []
+        terminadas = []
+        info = []
+        for juego, accion in zip(self.juegos, acciones):
+            puntaje = juego.puntaje
+            juego.step(int(accion))
+            recompensas.append(juego.puntaje - puntaje)
+            fin = juego.victoria or juego.game_over or juego.ticks >= self.max_ticks
+            terminadas.append(fin)
+            if fin:
+                info.append({'puntaje': juego.puntaje, 'victoria': juego.victoria,
+                             'ticks': juego.ticks})
+                juego.reiniciar()
+            else:
+                info.append(None)
+        if np is None:
+            return self._observar(), recompensas, terminadas, info
+        self.recompensas[:] = recompensas
+        self.terminadas[:] = terminadas
+        return self._observar(), self.recompensas, self.terminadas, info
+
+
+# Procesos
+
+def _trabajador(conexion, n, semilla, nivel, max_ticks, primero):
+    entorno = Entorno(n, semilla, nivel, max_ticks, primero)
+    while True:
+        orden, datos = conexion.recv()
+        if orden == 'step':
+            conexion.send(entorno.step(datos))
+        elif orden == 'reset':
+            conexion.send(entorno.reset())
+        else:
+            conexion.close()
+            return
+
+
+def _repartir(n, partes):
+    # Tamaños de n partidas repartidas en partes casi iguales
+    return [n // partes + (1 if i < n % partes else 0) for i in range(partes)]
+
+
+class EntornoParalelo:
+    def __init__(self, n, procesos=None, semilla=0, nivel='normal', max_ticks=3600):
+        procesos = min(procesos or os.cpu_count(), n)
+        self.n = n
+        self.tamanos = _repartir(n, procesos)
+        self.conexiones = []
+        self.procesos = []
+        primero = 0
+        for tamano in self.tamanos:
+            local, remota = multiprocessing.Pipe()
+            proceso = multiprocessing.Process(
+                target=_trabajador, args=(remota, tamano, semilla, nivel, max_ticks, primero),
+                daemon=True)
+            proceso.start()
+            remota.close()
+            self.conexiones.append(local)
+            self.procesos.append(proceso)
+            primero += tamano
+
+    def __len__(self):
+        return self.n
+
+    def _unir(self, partes):
+        if np is None:
+            return [fila for parte in partes for fila in parte]
+        return np.concatenate(partes)
+
+    def reset(self):
+        for conexion in self.conexiones:
+            conexion.send(('reset', None))
+        return self._unir([conexion.recv() for conexion in self.conexiones])
+
+    def step(self, acciones):
+        # Primero se envían todas las acciones, para que los procesos
+        # trabajen a la vez, y luego se juntan los resultados
+        desde = 0
+        for conexion, tamano in zip(self.conexiones, self.tamanos):
+            conexion.send(('step', list(acciones[desde:desde + tamano])))
+            desde += tamano
+        resultados = [conexion.recv() for conexion in self.conexiones]
+        observaciones = self._unir([r[0] for r in resultados])
+        recompensas = self._unir([r[1] for r in resultados])
+        terminadas = self._unir([r[2] for r in resultados])
+        info = [i for r in resultados for i in r[3]]
+        return observaciones, recompensas, terminadas, info
+
+    def cerrar(self):
+        for conexion in self.conexiones:
+            conexion.send(('cerrar', None))
+            conexion.close()
+        for proceso in self.procesos:
+            proceso.join()
+
+
+# Lotes de episodios completos
+
+def politica_aleatoria(rng, observacion):
+    # Cambia de entradas al azar cada tanto (IZQUIERDA, DERECHA, SALTAR, BAJAR)
+    return rng.randrange(16) if rng.random() < 0.05 else None
+
+
+def _correr_lote(politica, semillas, nivel, max_ticks):
+    generador = niveles.cargar(nivel)
+    resultados = []
+    for semilla in semillas:
+        juego = Juego(semilla=semilla, generador=generador)
+        rng = random.Random(semilla)
+        entradas = 0
+        while not (juego.victoria or juego.game_over or juego.ticks >= max_ticks):
+            nuevas = politica(rng, observar(juego))
+            if nuevas is not None:
+                entradas = nuevas
+            juego.step(entradas)
+        resultados.append({'semilla': semilla, 'puntaje': juego.puntaje,
+                           'victoria': juego.victoria, 'ticks': juego.ticks})
+    return resultados
+
+
+def correr_episodios(episodios, politica=politica_aleatoria, procesos=None, semilla=0,
+                     nivel='normal', max_ticks=3600):
+    # Corre los episodios repartidos entre procesos; la política debe poder
+    # enviarse a otro proceso (una función definida en un módulo)
+    procesos = min(procesos or os.cpu_count(), episodios)
+    semillas = list(range(semilla, semilla + episodios))
+    lotes = [semillas[i::procesos] for i in range(procesos)]
+    if procesos == 1:
+        return _correr_lote(politica, semillas, nivel, max_ticks)
+    with multiprocessing.Pool(procesos) as pool:
+        partes = pool.starmap(_correr_lote, [(politica, lote, nivel, max_ticks) for lote in lotes])
+    return sorted((r for parte in partes for r in parte), key=lambda r: r['semilla'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento del entorno por lotes")
+    parser.add_argument('--instancias', type=int, default=256)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--procesos', type=int, nargs='+',
+                        help="cantidades de procesos a medir (por defecto 1 y todos los núcleos)")
+    parser.add_argument('--nivel', default='normal')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    base = None
+    for procesos in args.procesos or sorted({1, os.cpu_count()}):
+        entorno = (Entorno(args.instancias, nivel=args.nivel) if procesos == 1 else
+                   EntornoParalelo(args.instancias, procesos, nivel=args.nivel))
+        entorno.reset()
+        acciones = [0] * args.instancias
+        inicio = time.perf_counter()
+        episodios = 0
+        for tick in range(args.ticks):
+            if tick % 20 == 0:
+                acciones = [rng.randrange(16) for _ in acciones]
+            _, _, _, info = entorno.step(acciones)
+            episodios += sum(1 for i in info if i)
+        segundos = time.perf_counter() - inicio
+        if procesos > 1:
+            entorno.cerrar()
+        velocidad = args.instancias * args.ticks / segundos
+        base = base or velocidad
+        print(f"{procesos:>3} procesos: {velocidad:>10.0f} ticks/s  "
+              f"(x{velocidad / base:.1f})  episodios terminados: {episodios}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import itertools
+from math import floor
+
+# Broadphase de colisiones con un hash espacial de celdas uniformes.
+#
+# Todas las colisiones con plataformas son de un solo sentido contra el
+# borde superior, así que cada plataforma se indexa solo en las celdas de
+# su borde superior. Las entidades (monedas, hongos, enemigos) se guardan
+# como celdas dinámicas que se actualizan solo cuando cambian de celda.
+
+TAM_CELDA = 100
+_NINGUNA = ()  # Resultado vacío compartido, para no crear listas en cada consulta
+
+
+class RejillaEspacial:
+    def __init__(self, tam_celda=TAM_CELDA):
+        self.tam_celda = tam_celda
+        self._inv_celda = 1.0 / tam_celda
+        self.plataformas = []
+        self.celdas_estaticas = {}  # (cx, cy) -> [índices en self.plataformas]
+        # Celdas extremas con plataformas (None si no hay ninguna)
+        self.col_min = self.col_max = self.fila_min = self.fila_max = None
+        self._consultas = {}        # rango de celdas -> plataformas (memo)
+        self._aisladas = {}         # (id de plataforma, ancho) -> bool (memo)
+        self.celdas_dinamicas = {}  # (cx, cy) -> {entidad: None}
+        self.entidades = {}         # entidad -> (orden, rango de celdas)
+        self._orden = itertools.count()
+
+    def _rango(self, x, y, ancho, alto):
+        # floor(x * inv) es monótona, así que plataformas y consultas caen
+        # siempre en celdas coherentes entre sí
+        inv = self._inv_celda
+        return (floor(x * inv), floor(y * inv), floor((x + ancho) * inv), floor((y + alto) * inv))
+
+    # Plataformas (estáticas)
+
+    def agregar_plataforma(self, rect):
+        indice = len(self.plataformas)
+        self.plataformas.append(rect)
+        cx0, cy, cx1, _ = self._rango(rect.x, rect.y, rect.width, 0)
+        for cx in range(cx0, cx1 + 1):
+            self.celdas_estaticas.setdefault((cx, cy), []).append(indice)
+        if self.fila_max is None:
+            self.col_min, self.fila_min, self.col_max, self.fila_max = cx0, cy, cx1, cy
+        else:
+            self.col_min = min(self.col_min, cx0)
+            self.col_max = max(self.col_max, cx1)
+            self.fila_min = min(self.fila_min, cy)
+            self.fila_max = max(self.fila_max, cy)
+        self._consultas.clear()
+        self._aisladas.clear()
+
+    def cargar_plataformas(self, plataformas, celdas, limites):
+        # Carga un índice ya calculado (niveles compilados): celdas como el
+        # de agregar_plataforma y limites = (col_min, fila_min, col_max, fila_max)
+        self.plataformas = plataformas
+        self.celdas_estaticas = celdas
+        self.col_min, self.fila_min, self.col_max, self.fila_max = limites
+        self._consultas.clear()
+        self._aisladas.clear()
+
+    def _plataformas_en_celdas(self, cx0, cy0, cx1, cy1):
+        # Las plataformas no cambian, así que cada rango se resuelve una vez
+        clave = (cx0, cy0, cx1, cy1)
+        resultado = self._consultas.get(clave)
+        if resultado is not None:
+            return resultado
+
+        # Solo se memorizan rangos dentro de las celdas con plataformas: los
+        # demás se recortan (fuera no hay nada), para que una entidad que se
+        # aleja del nivel no llene el memo sin límite
+        if self.fila_max is None:
+            return _NINGUNA
+        recortado = (max(cx0, self.col_min), max(cy0, self.fila_min),
+                     min(cx1, self.col_max), min(cy1, self.fila_max))
+        if recortado != clave:
+            if recortado[0] > recortado[2] or recortado[1] > recortado[3]:
+                return _NINGUNA
+            return self._plataformas_en_celdas(*recortado)
+        indices = set()
+        celdas = self.celdas_estaticas
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                celda = celdas.get((cx, cy))
+                if celda:
+                    indices.update(celda)
+        # Mismo orden que la lista original, para conservar el primer
+        # resultado de los bucles con break
+        resultado = [self.plataformas[i] for i in sorted(indices)]
+        self._consultas[clave] = resultado
+        return resultado
+
+    def plataformas_en(self, x, y, ancho, alto):
+        # Plataformas cuyo borde superior puede caer dentro de la caja
+        return self._plataformas_en_celdas(*self._rango(x, y, ancho, alto))
+
+    def aislada(self, plataforma, ancho):
+        # True si ninguna otra plataforma puede sostener a la vez a una
+        # entidad de ese ancho parada sobre esta: la banda de apoyo de los
+        # enemigos (de 5 px arriba a 20 px abajo del borde) no se cruza con
+        # la de otra plataforma que solape en x
+        clave = (id(plataforma), ancho)
+        resultado = self._aisladas.get(clave)
+        if resultado is None:
+            resultado = True
+            for otra in self.plataformas_en(plataforma.x - ancho, plataforma.y - 25,
+                                            plataforma.width + 2 * ancho, 50):
+                if (otra is not plataforma and abs(otra.y - plataforma.y) <= 25 and
+                    max(otra.x, plataforma.x) - ancho < min(otra.right, plataforma.right)):
+                    resultado = False
+                    break
+            self._aisladas[clave] = resultado
+        return resultado
+
+    # Entidades (dinámicas)
+
+    def mover_entidad(self, entidad):
+        # Inserta la entidad o actualiza sus celdas si cambió de celda
+        rango = self._rango(entidad.x, entidad.y, entidad.ancho, entidad.alto)
+        registro = self.entidades.get(entidad)
+        if registro is not None:
+            if registro[1] == rango:
+                return
+            self._sacar_de_celdas(entidad, registro[1])
+            orden = registro[0]
+        else:
+            orden = next(self._orden)
+        self.entidades[entidad] = (orden, rango)
+        cx0, cy0, cx1, cy1 = rango
+        celdas = self.celdas_dinamicas
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                celda = celdas.get((cx, cy))
+                if celda is None:
+                    celda = celdas[(cx, cy)] = {}
+                celda[entidad] = None
+
+    def quitar_entidad(self, entidad):
+        registro = self.entidades.pop(entidad, None)
+        if registro is not None:
+            self._sacar_de_celdas(entidad, registro[1])
+
+    def _sacar_de_celdas(self, entidad, rango):
+        cx0, cy0, cx1, cy1 = rango
+        celdas = self.celdas_dinamicas
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                celda = celdas[(cx, cy)]
+                del celda[entidad]
+                if not celda:
+                    del celdas[(cx, cy)]
+
+    def entidades_en(self, x, y, ancho, alto, tipo=None):
+        # Entidades cuyas celdas tocan la caja, en orden de inserción.
+        # Es una consulta amplia: hay que confirmar con colisionan().
+        cx0, cy0, cx1, cy1 = self._rango(x, y, ancho, alto)
+        encontradas = None
+        celdas = self.celdas_dinamicas
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                celda = celdas.get((cx, cy))
+                if celda:
+                    if encontradas is None:
+                        encontradas = {}
+                    encontradas.update(celda)
+        if encontradas is None:
+            return _NINGUNA
+        if tipo is not None:
+            encontradas = [e for e in encontradas if isinstance(e, tipo)]
+        if len(encontradas) < 2:
+            return list(encontradas)
+        entidades = self.entidades
+        return sorted(encontradas, key=lambda e: entidades[e][0])
@@ -0,0 +1,309 @@
+import heapq
+import itertools
+import struct
+
+from entidades import Goomba, Tortuga, Estrella, Hongo
+from juego import GRUPOS
+import almacen
+
+# Instantáneas del estado de un Juego: guardar, cargar y volver atrás.
+#
+# guardar(juego) empaqueta en un solo bytes todo lo que cambia durante la
+# partida: reloj, puntaje, temporizadores y estado del rng, jugador, cámara,
+# y posición, velocidad, dirección y banderas de cada moneda, hongo y
+# enemigo (también los dormidos y los congelados en sectores lejanos).
+# restaurar(juego, instantanea) lo vuelve a poner y la partida sigue
+# exactamente igual que si no se hubiera interrumpido.
+#
+# Las plataformas no se copian: la instantánea guarda una referencia al
+# mundo en que se tomó (no cambia durante la partida) y las entidades
+# apuntan a sus plataformas por índice. Una instantánea leída de disco no
+# trae el mundo y se restaura sobre el nivel que tenga el juego.
+#
+# diferencia(a, b) da solo las palabras de 8 bytes que cambiaron entre dos
+# instantáneas (entre ticks seguidos son pocas) y aplicar(a, delta) rehace b.
+# Historial guarda las de los últimos ticks para volver atrás y resimular.
+
+FIRMA = b'MINS'
+VERSION = 1
+
+# Formatos de struct de cada registro (sin el '<' inicial)
+# ticks, puntaje, victoria, game_over_avisado, ultimo_tiempo_tortuga,
+# intervalo_tortugas, avance, x_avance, version_mundo, cámara (x, x_ant),
+# rango de sectores cargados y cantidades de cada grupo en el juego y dormidas
+_JUEGO = 'Bqq??qqddqddqq' + 'I' * (2 * len(GRUPOS))
+# x, y, x_ant, y_ant, ancho, alto, vel_x, vel_y, saltando, vidas, direccion,
+# invencible, tiempo_invencible, grande, cayendo_activo
+_JUGADOR = 'ddddqqdd?qb?d??'
+_RNG = 'I' * 625
+# x, y, orden en la rejilla (-1 si no está)
+_MONEDA = 'ddq'
+# x, y, x_ant, y_ant, dirección, orden
+_HONGO = 'ddddbq'
+# tipo (0 goomba, 1 tortuga), x, y, x_ant, y_ant, ancho, alto, velocidad,
+# dirección, en_plataforma, vivo, índice del apoyo (-1 ninguno), tick en que
+# se durmió (-1 despierto), avance al que despertarlo, orden
+_ENEMIGO = 'Bddddqqdb??iqdq'
+_FORMATOS = {'monedas': _MONEDA, 'hongos': _HONGO, 'tortugas': _ENEMIGO, 'goombas': _ENEMIGO}
+_TIPOS = (Goomba, Tortuga)
+
+_CAMPOS_JUGADOR = ('x', 'y', 'x_ant', 'y_ant', 'ancho', 'alto', 'vel_x', 'vel_y', 'saltando',
+                   'vidas', 'direccion', 'invencible', 'tiempo_invencible', 'grande',
+                   'cayendo_activo')
+_CAMPOS_ENEMIGO = ('x', 'y', 'x_ant', 'y_ant', 'ancho', 'alto', 'velocidad', 'direccion',
+                   'en_plataforma', 'vivo')
+
+_CABECERA = struct.Struct('<' + _JUEGO)
+_ESTRUCTURAS = {}  # cantidades de cada grupo -> struct.Struct del total
+_indices = (None, {})  # (plataformas, id(plataforma) -> índice), del último mundo
+
+
+class Instantanea:
+    __slots__ = ('datos', 'mundo')
+
+    def __init__(self, datos, mundo=None):
+        self.datos = datos  # bytes empaquetados
+        self.mundo = mundo  # (plataformas, ancho_mundo) o None
+
+
+def _estructura(cantidades):
+    estructura = _ESTRUCTURAS.get(cantidades)
+    if estructura is None:
+        formato = ['<', _JUEGO, _JUGADOR, _RNG]
+        for grupo, n in zip(GRUPOS, cantidades):
+            formato.append(_FORMATOS[grupo] * n)
+        # Las congeladas en sectores llevan además su posición en todas()
+        for grupo, n in zip(GRUPOS, cantidades[len(GRUPOS):]):
+            formato.append((_FORMATOS[grupo] + 'I') * n)
+        estructura = _ESTRUCTURAS[cantidades] = struct.Struct(''.join(formato))
+    return estructura
+
+
+def _indice_plataformas(plataformas):
+    global _indices
+    if _indices[0] is not plataformas:
+        _indices = (plataformas, {id(p): i for i, p in enumerate(plataformas)})
+    return _indices[1]
+
+
+def _orden(juego, entidad):
+    if juego.almacen and hasattr(entidad, 'i'):
+        return int(juego.almacen.orden[entidad.i])
+    registro = juego.rejilla.entidades.get(entidad)
+    return -1 if registro is None else registro[0]
+
+
+def _empaquetar(valores, juego, grupo, entidad, indices, umbrales):
+    if grupo == 'monedas':
+        valores += (entidad.x, entidad.y, _orden(juego, entidad))
+    elif grupo == 'hongos':
+        valores += (entidad.x, entidad.y, entidad.x_ant, entidad.y_ant, entidad.direccion,
+                    _orden(juego, entidad))
+    else:
+        tipo = getattr(entidad, 'tipo', None) or type(entidad)
+        apoyo = getattr(entidad, 'apoyo', None)
+        dormido = getattr(entidad, 'dormido', None)
+        valores.append(_TIPOS.index(tipo))
+        valores += [getattr(entidad, campo) for campo in _CAMPOS_ENEMIGO]
+        valores += (-1 if apoyo is None else indices[id(apoyo)],
+                    -1 if dormido is None else dormido,
+                    umbrales.get(id(entidad), 0.0), _orden(juego, entidad))
+
+
+def guardar(juego):
+    dormidas = list(juego.sectores.todas())
+    cantidades = tuple(len(getattr(juego, grupo)) for grupo in GRUPOS)
+    cantidades += tuple(sum(1 for g, _ in dormidas if g == grupo) for grupo in GRUPOS)
+    camara = juego.camara
+    valores = [VERSION, juego.ticks, juego.puntaje, juego.victoria, juego.game_over_avisado,
+               juego.ultimo_tiempo_tortuga, juego.intervalo_tortugas, juego.avance,
+               juego.x_avance, juego.version_mundo, camara.x, camara.x_ant, *juego.sectores.rango,
+               *cantidades]
+    jugador = juego.jugador
+    valores += [getattr(jugador, campo) for campo in _CAMPOS_JUGADOR]
+    valores += juego.rng.getstate()[1]
+
+    indices = _indice_plataformas(juego.plataformas)
+    umbrales = {id(enemigo): umbral for umbral, _, enemigo in juego.dormidos}
+    for grupo in GRUPOS:
+        for entidad in getattr(juego, grupo):
+            _empaquetar(valores, juego, grupo, entidad, indices, umbrales)
+    # Las congeladas en sectores van por grupo
+    for grupo in GRUPOS:
+        for posicion, (g, entidad) in enumerate(dormidas):
+            if g == grupo:
+                _empaquetar(valores, juego, grupo, entidad, indices, umbrales)
+                valores.append(posicion)
+    datos = _estructura(cantidades).pack(*valores)
+    return Instantanea(datos, (juego.plataformas, juego.ancho_mundo))
+
+
+def _crear(grupo, valores, i, plataformas):
+    # Crea la entidad del registro que empieza en valores[i]. Devuelve
+    # (entidad, orden, dormido, umbral, índice del registro siguiente)
+    if grupo == 'monedas':
+        x, y, orden = valores[i:i + 3]
+        return Estrella(x, y), orden, -1, 0.0, i + 3
+    if grupo == 'hongos':
+        x, y, x_ant, y_ant, direccion, orden = valores[i:i + 6]
+        hongo = Hongo(x, y)
+        hongo.x_ant, hongo.y_ant, hongo.direccion = x_ant, y_ant, direccion
+        return hongo, orden, -1, 0.0, i + 6
+    tipo = _TIPOS[valores[i]]
+    enemigo = tipo.__new__(tipo)
+    for campo, valor in zip(_CAMPOS_ENEMIGO, valores[i + 1:i + 11]):
+        setattr(enemigo, campo, valor)
+    apoyo, dormido, umbral, orden = valores[i + 11:i + 15]
+    enemigo.apoyo = None if apoyo < 0 else plataformas[apoyo]
+    enemigo.dormido = None if dormido < 0 else dormido
+    return enemigo, orden, dormido, umbral, i + 15
+
+
+def restaurar(juego, instantanea):
+    datos = instantanea.datos
+    cabecera = _CABECERA.unpack_from(datos)
+    if cabecera[0] != VERSION:
+        raise ValueError("instantánea de otra versión")
+    cantidades = cabecera[-2 * len(GRUPOS):]
+    valores = _estructura(cantidades).unpack(datos)
+
+    # Mundo (solo cambia si la instantánea es de antes de un reinicio)
+    if instantanea.mundo is not None and instantanea.mundo[0] is not juego.plataformas:
+        juego.plataformas, juego.ancho_mundo = instantanea.mundo
+        juego.camara.ancho_mundo = juego.ancho_mundo
+        juego.rejilla = juego.crear_rejilla()
+    rejilla = juego.rejilla
+    rejilla.celdas_dinamicas.clear()
+    rejilla.entidades.clear()
+
+    (_, juego.ticks, juego.puntaje, juego.victoria, juego.game_over_avisado,
+     juego.ultimo_tiempo_tortuga, juego.intervalo_tortugas, juego.avance, juego.x_avance,
+     juego.version_mundo, juego.camara.x, juego.camara.x_ant, primero, ultimo) = cabecera[:14]
+    juego.sectores.rango = (primero, ultimo)
+    i = len(cabecera)
+    jugador = juego.jugador
+    for campo, valor in zip(_CAMPOS_JUGADOR, valores[i:i + len(_CAMPOS_JUGADOR)]):
+        setattr(jugador, campo, valor)
+    i += len(_CAMPOS_JUGADOR)
+    juego.rng.setstate((3, valores[i:i + 625], None))
+    i += 625
+
+    if juego.almacen:
+        juego.almacen = almacen.AlmacenEnemigos(juego.plataformas)
+    registrar = []  # (orden, grupo, posición en la lista, entidad)
+    dormidos = []
+    for grupo, n in zip(GRUPOS, cantidades):
+        entidades = []
+        for _ in range(n):
+            entidad, orden, dormido, umbral, i = _crear(grupo, valores, i, juego.plataformas)
+            if dormido >= 0:
+                dormidos.append((umbral, entidad))
+            registrar.append((orden, grupo, len(entidades), entidad))
+            entidades.append(entidad)
+        setattr(juego, grupo, entidades)
+
+    # Se vuelven a insertar en el orden original: de él depende el orden en
+    # que se resuelven los choques
+    registrar.sort(key=lambda r: r[0])
+    for orden, grupo, posicion, entidad in registrar:
+        if orden < 0:
+            continue
+        if juego.almacen and grupo in ('tortugas', 'goombas'):
+            vista = juego.almacen.agregar(entidad)
+            vista.x_ant, vista.y_ant, vista.vivo = entidad.x_ant, entidad.y_ant, entidad.vivo
+            getattr(juego, grupo)[posicion] = vista
+        else:
+            rejilla.mover_entidad(entidad)
+
+    juego.orden_dormidos = itertools.count()
+    juego.dormidos = [(umbral, next(juego.orden_dormidos), enemigo) for umbral, enemigo in dormidos]
+    heapq.heapify(juego.dormidos)
+
+    congeladas = []
+    for grupo, n in zip(GRUPOS, cantidades[len(GRUPOS):]):
+        for _ in range(n):
+            entidad, _, _, _, i = _crear(grupo, valores, i, juego.plataformas)
+            congeladas.append((valores[i], grupo, entidad))
+            i += 1
+    congeladas.sort(key=lambda c: c[0])
+    sectores = juego.sectores
+    sectores.dormidas = {}
+    sectores.cantidades = {}
+    for _, grupo, entidad in congeladas:
+        sectores.dormir(grupo, entidad)
+
+
+def diferencia(a, b):
+    # Delta de la instantánea a a la b: (largo de b, [(palabra, bytes), ...])
+    # con los tramos de palabras de 8 bytes que cambiaron
+    a, b = a.datos, b.datos
+    tramos = []
+    inicio = None
+    for palabra in range(0, (len(b) + 7) // 8):
+        desde = palabra * 8
+        igual = a[desde:desde + 8] == b[desde:desde + 8]
+        if not igual and inicio is None:
+            inicio = palabra
+        elif igual and inicio is not None:
+            tramos.append((inicio, b[inicio * 8:desde]))
+            inicio = None
+    if inicio is not None:
+        tramos.append((inicio, b[inicio * 8:]))
+    return len(b), tramos
+
+
+def aplicar(a, delta):
+    # Rehace la instantánea b a partir de a y diferencia(a, b)
+    largo, tramos = delta
+    datos = bytearray(a.datos[:largo].ljust(largo, b'\0'))
+    for palabra, trozo in tramos:
+        datos[palabra * 8:palabra * 8 + len(trozo)] = trozo
+    return Instantanea(bytes(datos), a.mundo)
+
+
+def escribir(ruta, instantanea):
+    with open(ruta, 'wb') as f:
+        f.write(FIRMA + instantanea.datos)
+
+
+def leer(ruta):
+    # La instantánea leída se restaura sobre el nivel que tenga el juego
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    if not datos.startswith(FIRMA):
+        raise ValueError(f"{ruta} no es una instantánea")
+    return Instantanea(datos[len(FIRMA):])
+
+
+class Historial:
+    # Instantáneas de los últimos ticks, para volver atrás y resimular con
+    # otras entradas (p. ej. al llegar tarde las de otro jugador)
+    def __init__(self, capacidad=60):
+        self.capacidad = capacidad
+        self.instantaneas = {}  # tick -> Instantanea
+        self.ultimo_tick = 0
+        self.version_mundo = None
+
+    def registrar(self, juego):
+        # Llamar después de cada step. Si los ticks van hacia atrás o cambió
+        # el mundo (reinicio, instantánea cargada) lo guardado es de otra
+        # partida y se olvida
+        ticks = juego.ticks
+        if ticks < self.ultimo_tick or juego.version_mundo != self.version_mundo:
+            self.instantaneas.clear()
+        self.ultimo_tick = ticks
+        self.version_mundo = juego.version_mundo
+        self.instantaneas[ticks] = guardar(juego)
+        for viejo in [t for t in self.instantaneas if t <= ticks - self.capacidad]:
+            del self.instantaneas[viejo]
+
+    def volver(self, juego, tick):
+        # Deja el juego como estaba al terminar ese tick; False si ya no está
+        instantanea = self.instantaneas.get(tick)
+        if instantanea is None:
+            return False
+        restaurar(juego, instantanea)
+        self.ultimo_tick = tick
+        for posterior in [t for t in self.instantaneas if t > tick]:
+            del self.instantaneas[posterior]
+        return True
@@ -0,0 +1,515 @@
+import heapq
+import itertools
+import random
+
+import pygame
+
+from constantes import ANCHO, ALTO, FPS, REINICIAR
+from entidades import Jugador, Goomba, Tortuga, Estrella, Hongo, Reserva, colisionan
+from espacial import RejillaEspacial
+from sectores import Camara, Sectores
+import almacen
+
+# Simulación del juego sin ventana ni mezclador. Se avanza con
+# Juego.step(entradas) y puede correr bajo SDL_VIDEODRIVER=dummy a miles
+# de ticks por segundo; mario.py solo lee el teclado y dibuja el estado.
+
+
+def _recogida(moneda):
+    return moneda.recogida
+
+
+def _recogido(hongo):
+    return hongo.recogido
+
+
+def _muerto(enemigo):
+    return not enemigo.vivo
+
+
+def compactar(entidades, quitar, reserva=None):
+    # Quita de la lista, en el lugar y en una sola pasada, las entidades para
+    # las que quitar(e) es verdadero, conservando el orden de las demás (el
+    # orden decide qué choque se resuelve primero). Las quitadas vuelven a la
+    # reserva si se indica una.
+    j = 0
+    for entidad in entidades:
+        if quitar(entidad):
+            if reserva is not None:
+                reserva.devolver(entidad)
+        else:
+            entidades[j] = entidad
+            j += 1
+    del entidades[j:]
+
+
+def crear_mundo(rng=random):
+    # Plataformas
+    plataformas = [
+        pygame.Rect(0, ALTO-50, ANCHO, 50),  # Suelo principal
+        pygame.Rect(100, 450, 200, 20),
+        pygame.Rect(400, 450, 200, 20),
+        pygame.Rect(150, 350, 200, 20),
+        pygame.Rect(450, 350, 200, 20),
+        pygame.Rect(200, 250, 150, 20),
+        pygame.Rect(450, 250, 150, 20),
+        pygame.Rect(350, 180, 100, 15)
+    ]
+
+    # Monedas (estrellas) - Exactamente 10 monedas
+    monedas = []
+    plataformas_validas = [p for p in plataformas if p.y < ALTO - 100]
+    for _ in range(10):  # Solo crea 10 monedas iniciales
+        plat = rng.choice(plataformas_validas)
+        monedas.append(Estrella(
+            rng.randint(plat.x + 10, plat.x + plat.width - 30),
+            plat.y - 30
+        ))
+
+    # Goombas
+    goombas = [
+        Goomba(150, 450-40),
+        Goomba(450, 450-40),
+        Goomba(200, 350-40),
+        Goomba(500, 350-40),
+        Goomba(250, 250-40)
+    ]
+
+    # Hongos (aparecen aleatoriamente)
+    hongos = [Hongo(300, 450-30)]
+
+    # Tortugas (se generarán aleatoriamente durante el juego)
+    tortugas = []
+
+    return plataformas, monedas, goombas, hongos, tortugas
+
+
+def crear_mundo_largo(rng=random, pantallas=12):
+    # El nivel de crear_mundo repetido hacia la derecha sobre un suelo
+    # continuo, con las 10 monedas repartidas por todo el recorrido
+    plataformas, _, goombas, hongos, tortugas = crear_mundo(rng)
+    base = plataformas[1:]
+    plataformas = [pygame.Rect(0, ALTO-50, ANCHO * pantallas, 50)]
+    goombas_base = [(g.x, g.y) for g in goombas]
+    goombas = []
+    for i in range(pantallas):
+        plataformas.extend(p.move(i * ANCHO, 0) for p in base)
+        goombas.extend(Goomba(x + i * ANCHO, y) for x, y in goombas_base)
+
+    monedas = []
+    plataformas_validas = [p for p in plataformas if p.y < ALTO - 100]
+    for _ in range(10):
+        plat = rng.choice(plataformas_validas)
+        monedas.append(Estrella(
+            rng.randint(plat.x + 10, plat.x + plat.width - 30),
+            plat.y - 30
+        ))
+    return plataformas, monedas, goombas, hongos, tortugas
+
+
+# Niveles incluidos: nombre -> generador
+NIVELES = {'normal': crear_mundo, 'largo': crear_mundo_largo}
+
+# Listas de entidades del Juego que se cargan y descargan por sectores
+GRUPOS = ('monedas', 'hongos', 'tortugas', 'goombas')
+ENEMIGOS = ('tortugas', 'goombas')
+
+# Enemigos dormidos: los que patrullan una plataforma aislada lejos de la
+# vista no se simulan tick a tick. Se duermen a más de DISTANCIA_DORMIR px
+# de la cámara y del jugador y se despiertan antes de poder acercarse a
+# menos de DISTANCIA_DESPERTAR; al despertar, Enemigo.patrullar los pone
+# donde habrían estado. Ninguno se mueve más rápido que VELOCIDAD_MAX_ENEMIGO.
+DISTANCIA_DORMIR = 300
+DISTANCIA_DESPERTAR = 100
+VELOCIDAD_MAX_ENEMIGO = 2
+
+
+class Juego:
+    def __init__(self, hz=FPS, vectorizado=False, semilla=None, generador=crear_mundo):
+        # Frecuencia de la física. Las velocidades de las entidades están en
+        # píxeles por cuadro de 60 Hz, así que cada tick avanza dt cuadros.
+        self.hz = hz
+        self.dt = FPS / hz
+
+        # Con vectorizado=True los enemigos viven en un AlmacenEnemigos de
+        # NumPy y se actualizan todos juntos en cada tick
+        if vectorizado and not almacen.disponible():
+            print("NumPy no está instalado, usando enemigos sin vectorizar...")
+            vectorizado = False
+        self.vectorizado = vectorizado
+        self.max_tortugas = 4  # Máximo de tortugas en pantalla
+        self.version_mundo = 0
+
+        # Las tortugas muertas se reciclan para las que aparecen después
+        self.reserva_tortugas = Reserva(Tortuga)
+
+        # Función que arma el nivel a partir del rng; devuelve lo mismo que
+        # crear_mundo: (plataformas, monedas, goombas, hongos, tortugas)
+        self.generador = generador
+
+        # Perfilador opcional (perfilador.Perfilador); con None no se mide nada
+        self.perfilador = None
+        self.eventos = []
+
+        # Todo el azar sale de este generador: con la misma semilla y las
+        # mismas entradas cada partida se repite exactamente
+        if semilla is None:
+            semilla = random.randrange(2**32)
+        self.semilla = semilla
+        self.rng = random.Random(semilla)
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.plataformas, self.monedas, self.goombas, self.hongos, self.tortugas = self.generador(self.rng)
+        self.jugador = Jugador(100, ALTO - 110)
+        self.puntaje = 0
+
+        # Cambia cada vez que cambian las plataformas; el renderizador la usa
+        # para saber cuándo rehacer su capa estática
+        self.version_mundo += 1
+
+        # Broadphase: plataformas como celdas estáticas, el resto dinámicas
+        self.rejilla = self.crear_rejilla()
+        for entidades in (self.monedas, self.hongos):
+            for entidad in entidades:
+                self.rejilla.mover_entidad(entidad)
+
+        if self.vectorizado:
+            self.almacen = almacen.AlmacenEnemigos(self.plataformas)
+        else:
+            self.almacen = None
+        self.goombas = [self._nuevo_enemigo(g) for g in self.goombas]
+        self.tortugas = [self._nuevo_enemigo(t) for t in self.tortugas]
+
+        # Montículo de enemigos dormidos: (avance al que despertarlo, orden,
+        # enemigo). avance suma cuánto pudo acercarse cualquier enemigo a la
+        # vista desde el inicio: el desplazamiento del jugador (la cámara lo
+        # sigue) más la velocidad máxima de los enemigos.
+        self.dormidos = []
+        self.orden_dormidos = itertools.count()
+        self.avance = 0.0
+        self.x_avance = self.jugador.x
+
+        # Cámara y sectores: lo que está lejos de la cámara se descarga
+        self.ancho_mundo = max([ANCHO] + [p.right for p in self.plataformas])
+        self.camara = Camara(self.ancho_mundo)
+        self.camara.seguir(self.jugador)
+        self.camara.guardar_posicion()
+        self.sectores = Sectores()
+        self._actualizar_sectores()
+
+        self.victoria = False
+        self.game_over_avisado = False  # Para emitir el evento de game over una sola vez
+
+        # Reloj propio en ticks: no depende de pygame.time.get_ticks()
+        self.ticks = 0
+
+        # Variables para control de aparición de tortugas
+        self.ultimo_tiempo_tortuga = 0
+        self.intervalo_tortugas = 5000  # 5 segundos en milisegundos
+
+    def crear_rejilla(self):
+        # Rejilla con las plataformas actuales. Los niveles compilados
+        # (niveles.Nivel) traen las celdas ya hechas.
+        crear_rejilla = getattr(self.generador, 'crear_rejilla', None)
+        if crear_rejilla:
+            return crear_rejilla()
+        rejilla = RejillaEspacial()
+        for plataforma in self.plataformas:
+            rejilla.agregar_plataforma(plataforma)
+        return rejilla
+
+    @property
+    def tiempo_ms(self):
+        return self.ticks * 1000 // self.hz
+
+    @property
+    def cantidad_entidades(self):
+        return 1 + len(self.monedas) + len(self.hongos) + len(self.tortugas) + len(self.goombas)
+
+    @property
+    def game_over(self):
+        return self.jugador.vidas <= 0
+
+    def step(self, entradas=0):
+        # Avanza un tick de simulación. Devuelve la lista de eventos del tick
+        # ('moneda', 'pisar', 'game_over') para que el cliente reproduzca
+        # sonidos; la lista se reutiliza en el tick siguiente, así que hay que
+        # leerla antes.
+        # Reiniciar también es una entrada, para poder grabarlo y repetirlo.
+        if entradas & REINICIAR:
+            self.reiniciar()
+        eventos = self.eventos
+        eventos.clear()
+        self.ticks += 1
+        dt = self.dt
+        jugador = self.jugador
+        perf = self.perfilador
+        self._guardar_posiciones()
+
+        # Movimiento
+        jugador.mover(entradas, dt)
+        jugador.gravedad(self.rejilla, dt)
+
+        # Actualizar invencibilidad
+        jugador.actualizar_invencibilidad(dt)
+        if perf:
+            perf.marcar('jugador')
+
+        self.camara.seguir(jugador)
+        self._actualizar_sectores()
+        if perf:
+            perf.marcar('sectores')
+
+        self._generar_tortugas()
+        if perf:
+            perf.marcar('tortugas_nuevas')
+
+        # Recolectar estrellas
+        for moneda in self._cerca_del_jugador(Estrella):
+            if not moneda.recogida and colisionan(jugador, moneda):
+                moneda.recogida = True
+                self.puntaje += 10
+                self.rejilla.quitar_entidad(moneda)
+                eventos.append('moneda')
+        if 'moneda' in eventos:
+            compactar(self.monedas, _recogida)
+
+        # Verificar condición de victoria
+        if len(self.monedas) == 0 and not self.victoria and not self.sectores.cantidad('monedas'):
+            self.victoria = True
+            # Congelar al jugador
+            jugador.vel_x = 0
+            jugador.vel_y = 0
+        if perf:
+            perf.marcar('monedas')
+
+        # Mover y recolectar Hongos
+        for hongo in self.hongos:
+            hongo.mover(self.rejilla, dt)
+            self.rejilla.mover_entidad(hongo)
+        recogidos = False
+        for hongo in self._cerca_del_jugador(Hongo):
+            if not hongo.recogido and colisionan(jugador, hongo):
+                hongo.recogido = True
+                recogidos = True
+                self.rejilla.quitar_entidad(hongo)
+                jugador.vidas += 1
+                jugador.hacer_grande()  # Mario se hace grande al coger el hongo
+        if recogidos:
+            compactar(self.hongos, _recogido)
+        if perf:
+            perf.marcar('hongos')
+
+        # Mover Tortugas y Goombas. El movimiento de los enemigos no depende
+        # del jugador, así que se mueven todos y luego se resuelven las
+        # colisiones con los cercanos, en el mismo orden que la lista.
+        if self.almacen:
+            self._actualizar_almacen(dt)
+        else:
+            self._despertar_cercanos(dt)
+            self._actualizar_enemigos(self.tortugas, Tortuga, dt, self.reserva_tortugas)
+            self._actualizar_enemigos(self.goombas, Goomba, dt)
+        if perf:
+            perf.marcar('enemigos')
+
+        if self.game_over and not self.game_over_avisado:
+            self.game_over_avisado = True
+            eventos.append('game_over')
+
+        return eventos
+
+    def _cerca_del_jugador(self, tipo, margen=0):
+        # Candidatos de la broadphase alrededor del jugador
+        jugador = self.jugador
+        return self.rejilla.entidades_en(jugador.x - margen, jugador.y,
+                                         jugador.ancho + 2 * margen, jugador.alto, tipo)
+
+    def _actualizar_enemigos(self, enemigos, tipo, dt, reserva=None):
+        rejilla = self.rejilla
+        izquierda, derecha = self._vista()
+        izquierda -= DISTANCIA_DORMIR
+        derecha += DISTANCIA_DORMIR
+        for enemigo in enemigos:
+            if enemigo.dormido is not None:
+                continue
+            enemigo.mover(rejilla, dt)
+            rejilla.mover_entidad(enemigo)
+            if ((enemigo.x > derecha or enemigo.x + enemigo.ancho < izquierda) and
+                enemigo.apoyo is not None and enemigo.velocidad <= VELOCIDAD_MAX_ENEMIGO and
+                enemigo.puede_dormir(dt)):
+                self._dormir(enemigo)
+
+        # El margen cubre el empujón de 50 px tras un golpe lateral
+        muertos = False
+        for enemigo in self._cerca_del_jugador(tipo, 50):
+            if enemigo.vivo:
+                self._colision_enemigo(enemigo)
+                if not enemigo.vivo:
+                    self.rejilla.quitar_entidad(enemigo)
+                    muertos = True
+        if muertos:
+            compactar(enemigos, _muerto, reserva)
+
+    def _vista(self):
+        # Zona horizontal que abarca la cámara y el jugador
+        camara = self.camara
+        jugador = self.jugador
+        return (min(camara.x, jugador.x),
+                max(camara.x + camara.ancho, jugador.x + jugador.ancho))
+
+    def _distancia_a_la_vista(self, enemigo):
+        izquierda, derecha = self._vista()
+        return max(izquierda - enemigo.x - enemigo.ancho, enemigo.x - derecha)
+
+    def _dormir(self, enemigo):
+        enemigo.dormido = self.ticks
+        umbral = self.avance + self._distancia_a_la_vista(enemigo) - DISTANCIA_DESPERTAR
+        heapq.heappush(self.dormidos, (umbral, next(self.orden_dormidos), enemigo))
+
+    def _despertar(self, enemigo, dt):
+        # Lo pone donde estaría al terminar el tick anterior, que es cuando
+        # se despierta (antes de moverse en este tick)
+        enemigo.patrullar(self.ticks - 1 - enemigo.dormido, dt)
+        enemigo.x_ant = enemigo.x
+        enemigo.dormido = None
+        self.rejilla.mover_entidad(enemigo)
+
+    def _despertar_cercanos(self, dt):
+        jugador = self.jugador
+        self.avance += abs(jugador.x - self.x_avance) + VELOCIDAD_MAX_ENEMIGO * dt
+        self.x_avance = jugador.x
+        dormidos = self.dormidos
+        while dormidos and dormidos[0][0] <= self.avance:
+            self._despertar(heapq.heappop(dormidos)[2], dt)
+
+    def _despertar_todos(self):
+        for _, _, enemigo in self.dormidos:
+            self._despertar(enemigo, self.dt)
+        self.dormidos.clear()
+
+    def sincronizar(self):
+        # Lleva los enemigos dormidos a su posición actual sin despertarlos,
+        # para leer el estado entre ticks (hash, observaciones)
+        for _, _, enemigo in self.dormidos:
+            enemigo.patrullar(self.ticks - enemigo.dormido, self.dt)
+            enemigo.dormido = self.ticks
+
+    def _nuevo_enemigo(self, enemigo):
+        if self.almacen:
+            vista = self.almacen.agregar(enemigo)
+            if type(enemigo) is Tortuga:
+                # Sus datos ya están en el almacén: el objeto se puede reciclar
+                self.reserva_tortugas.devolver(enemigo)
+            return vista
+        self.rejilla.mover_entidad(enemigo)
+        return enemigo
+
+    def _actualizar_almacen(self, dt):
+        self.almacen.mover(dt)
+        muertos = False
+        for enemigo in self.almacen.cerca_de(self.jugador, 50):
+            if enemigo.vivo:
+                self._colision_enemigo(enemigo)
+                muertos = muertos or not enemigo.vivo
+        if muertos:
+            for enemigos in (self.tortugas, self.goombas):
+                for enemigo in enemigos:
+                    if not enemigo.vivo:
+                        self.almacen.quitar(enemigo)
+                compactar(enemigos, _muerto)
+
+    def _actualizar_sectores(self):
+        # Carga y descarga entidades cuando la cámara cambia de sector
+        sectores = self.sectores
+        rango = sectores.rango_para(self.camara)
+        if rango == sectores.rango:
+            return
+        sectores.rango = rango
+        self._despertar_todos()
+
+        def lejos(entidad):
+            return not sectores.cargado(entidad.x)
+
+        for grupo in GRUPOS:
+            entidades = getattr(self, grupo)
+            dormidas = [e for e in entidades if lejos(e)]
+            if not dormidas:
+                continue
+            for entidad in dormidas:
+                if self.almacen and grupo in ENEMIGOS:
+                    # Se guarda como objeto normal y su fila queda libre
+                    sectores.dormir(grupo, self.almacen.sacar(entidad))
+                else:
+                    self.rejilla.quitar_entidad(entidad)
+                    sectores.dormir(grupo, entidad)
+            compactar(entidades, lejos)
+
+        for grupo, entidad in sectores.despertar(*rango):
+            if grupo in ENEMIGOS:
+                entidad = self._nuevo_enemigo(entidad)
+            else:
+                self.rejilla.mover_entidad(entidad)
+            getattr(self, grupo).append(entidad)
+
+    def _guardar_posiciones(self):
+        self.jugador.guardar_posicion()
+        self.camara.guardar_posicion()
+        if self.almacen:
+            self.almacen.guardar_posiciones()
+            grupos = (self.hongos,)
+        else:
+            grupos = (self.hongos, self.tortugas, self.goombas)
+        for entidades in grupos:
+            for entidad in entidades:
+                entidad.guardar_posicion()
+
+    def _generar_tortugas(self):
+        # Generar nuevas tortugas aleatoriamente
+        tiempo_actual = self.tiempo_ms
+        if (tiempo_actual - self.ultimo_tiempo_tortuga > self.intervalo_tortugas and
+            len(self.tortugas) < self.max_tortugas):
+
+            # Decidir de qué lado aparece (0: izquierda, 1: derecha)
+            lado = self.rng.randint(0, 1)
+            if lado == 0:
+                # Aparece por la izquierda de la cámara, moviéndose a la derecha
+                tortuga = self.reserva_tortugas.obtener(self.camara.x - 50, ALTO - 100, 1)
+            else:
+                # Aparece por la derecha de la cámara, moviéndose a la izquierda
+                tortuga = self.reserva_tortugas.obtener(self.camara.x + ANCHO + 50, ALTO - 100, -1)
+            self.tortugas.append(self._nuevo_enemigo(tortuga))
+
+            self.ultimo_tiempo_tortuga = tiempo_actual
+            # Hacer el intervalo un poco aleatorio (entre 3 y 7 segundos)
+            self.intervalo_tortugas = self.rng.randint(3000, 7000)
+
+    def _colision_enemigo(self, enemigo):
+        jugador = self.jugador
+        if not colisionan(jugador, enemigo):
+            return
+
+        # Si cae sobre el enemigo (lo mata)
+        if (jugador.y + jugador.alto < enemigo.y + 20 and
+            jugador.vel_y > 0):
+
+            self.puntaje += enemigo.golpear()
+            jugador.vel_y = -10
+            self.eventos.append('pisar')
+
+        # Colisión lateral
+        elif not jugador.invencible:
+            if jugador.grande:
+                # Volver a estado pequeño
+                jugador.grande = False
+                jugador.ancho = 40
+                jugador.alto = 60
+                jugador.y += 20  # Ajustar posición al encogerse
+                jugador.hacer_invencible(60)  # 1 segundo de invencibilidad
+            else:
+                # Restar una vida (en la última el juego termina)
+                jugador.vidas -= 1
+                jugador.hacer_invencible(60)  # 1 segundo de invencibilidad
+
+            # Empujar al jugador
+            jugador.x -= 50 if jugador.x < enemigo.x else -50
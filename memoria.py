@@ -0,0 +1,175 @@
+import argparse
+import gc
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from constantes import ANCHO, ALTO
+
+# Recolección de basura fuera de los cuadros y presupuestos de asignaciones.
+#
+# El gc automático de Python recolecta cada vez que se juntan 700 objetos
+# nuevos, en medio de cualquier fase, y cada tanto recorre todos los
+# objetos vivos, el mundo entero incluido: esos son los tirones
+# periódicos. RecolectorDiferido apaga el gc automático y recolecta al
+# final del cuadro, si sobra tiempo hasta el siguiente. Después de cargar
+# el mundo, congelar() pasa todo lo que existe a la generación permanente
+# (gc.freeze), que las recolecciones ya no recorren.
+#
+# El Perfilador cuenta por fase los objetos del gc y los bloques de
+# memoria que quedan vivos al terminarla. PRESUPUESTOS fija cuántos puede
+# dejar cada fase en un cuadro normal de la partida; python memoria.py
+# juega partidas sin ventana y falla si algún cuadro se pasa.
+#
+# Uso:  python memoria.py --ticks 1500
+
+MARGEN = 0.002   # Segundos libres que hacen falta para recolectar al final del cuadro
+ATRASO_MAX = 10  # Con tantos umbrales de objetos pendientes se recolecta igual
+
+# fase -> (objetos del gc, bloques de memoria) que puede dejar en un cuadro.
+# Los picos son de cuadros con trabajo real: cargar un sector crea sus
+# entidades, aparece una tortuga o cambia el marcador.
+PRESUPUESTOS = {
+    'jugador': (4, 8),
+    'sectores': (16, 24),
+    'tortugas_nuevas': (2, 10),
+    'monedas': (4, 6),
+    'hongos': (4, 8),
+    'enemigos': (24, 48),
+    'dibujo_fondo': (4, 6),
+    'dibujo_sprites': (16, 32),
+    'dibujo_hud': (1, 4),
+}
+PRESUPUESTO_OTRAS = (4, 8)
+
+
+class RecolectorDiferido:
+    def __init__(self):
+        self.umbrales = gc.get_threshold()
+        self.recolecciones = 0
+        self.diferidas = 0
+        gc.disable()
+
+    def congelar(self):
+        # Llamar después de cargar el mundo. Lo congelado antes vuelve a
+        # recorrerse una vez, por si quedaron ciclos del mundo anterior
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def terminar_cuadro(self, libre):
+        # libre: segundos que quedan hasta el próximo cuadro. Devuelve la
+        # generación recolectada o None. Las generaciones se eligen como lo
+        # haría el gc automático con los mismos umbrales.
+        pendientes, jovenes, viejas = gc.get_count()
+        umbral0, umbral1, umbral2 = self.umbrales
+        if pendientes < umbral0:
+            return None
+        if libre < MARGEN and pendientes < umbral0 * ATRASO_MAX:
+            self.diferidas += 1
+            return None
+        if viejas >= umbral2:
+            generacion = 2
+        elif jovenes >= umbral1:
+            generacion = 1
+        else:
+            generacion = 0
+        gc.collect(generacion)
+        self.recolecciones += 1
+        return generacion
+
+    def cerrar(self):
+        gc.unfreeze()
+        gc.enable()
+
+
+# Modo de prueba
+
+def comprobar(nivel, semilla, ticks, calentamiento=60):
+    # Juega sin ventana con entradas fijas y devuelve (estadísticas,
+    # excesos): por fase [objetos máx, bloques máx, objetos prom, bloques
+    # prom] y la lista de (tick, fase, objetos, bloques) que superan su
+    # presupuesto. La partida se juega dos veces y solo se mide la segunda,
+    # con las cachés de sprites y textos ya llenas.
+    from benchmark import entradas_guion
+    from juego import Juego
+    import niveles
+    from perfilador import Perfilador
+    from render import Renderizador
+
+    renderizador = Renderizador(pygame.Surface((ANCHO, ALTO)))
+    generador = niveles.cargar(nivel)
+    entradas = entradas_guion(semilla, ticks)
+    recolector = RecolectorDiferido()
+    # Listas que se modifican en el lugar: crear tuplas aquí entre cuadro
+    # y cuadro movería las cuentas del cuadro siguiente
+    estadisticas = {}
+    excesos = []
+    try:
+        for medir in (False, True):
+            juego = Juego(semilla=semilla, generador=generador)
+            perf = juego.perfilador = renderizador.perfilador = Perfilador()
+            renderizador.invalidar()
+            recolector.congelar()
+            for tick, e in enumerate(entradas):
+                perf.iniciar_cuadro()
+                juego.step(e)
+                renderizador.dibujar(juego)
+                perf.terminar_cuadro()
+                recolector.terminar_cuadro(1)
+                if not medir or tick < calentamiento:
+                    continue
+                _, _, fases, _ = perf.cuadros[(perf.indice - 1) % perf.capacidad]
+                for fase, _, _, bloques, objetos in fases:
+                    if fase not in estadisticas:
+                        estadisticas[fase] = [0, 0, 0, 0]
+                    datos = estadisticas[fase]
+                    datos[0] = max(datos[0], objetos)
+                    datos[1] = max(datos[1], bloques)
+                    datos[2] += objetos
+                    datos[3] += bloques
+                    limite_objetos, limite_bloques = PRESUPUESTOS.get(fase, PRESUPUESTO_OTRAS)
+                    if objetos > limite_objetos or bloques > limite_bloques:
+                        excesos.append((tick, fase, objetos, bloques))
+    finally:
+        recolector.cerrar()
+    cuadros = max(1, ticks - calentamiento)
+    for datos in estadisticas.values():
+        datos[2] /= cuadros
+        datos[3] /= cuadros
+    return estadisticas, excesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comprueba los presupuestos de asignaciones por fase")
+    parser.add_argument('--niveles', nargs='+', default=['normal', 'largo'])
+    parser.add_argument('--semillas', type=int, default=3)
+    parser.add_argument('--ticks', type=int, default=1500)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((ANCHO, ALTO))
+    fallos = 0
+    for nivel in args.niveles:
+        for semilla in range(args.semillas):
+            estadisticas, excesos = comprobar(nivel, semilla, args.ticks)
+            print(f"{nivel}, semilla {semilla}: {len(excesos)} cuadros fuera de presupuesto")
+            for fase, (objetos, bloques, prom_objetos, prom_bloques) in estadisticas.items():
+                limite = PRESUPUESTOS.get(fase, PRESUPUESTO_OTRAS)
+                print(f"  {fase:<16} objetos máx {objetos:>3} (de {limite[0]:>2}, "
+                      f"prom {prom_objetos:.2f})  bloques máx {bloques:>3} "
+                      f"(de {limite[1]:>2}, prom {prom_bloques:.2f})")
+            for tick, fase, objetos, bloques in excesos[:5]:
+                print(f"  EXCESO tick {tick} {fase}: {objetos} objetos, {bloques} bloques")
+            fallos += len(excesos)
+    if fallos:
+        sys.exit(1)
+    print("Todos los cuadros dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import pygame
+
+from constantes import ALTO
+from entidades import Goomba, Tortuga, Estrella, Hongo
+from espacial import RejillaEspacial
+from juego import NIVELES
+
+# Niveles definidos en archivos en lugar de en el código.
+#
+# La fuente es un JSON editable a mano (ver mundos/normal.json):
+#
+#   {"plataformas": [[x, y, ancho, alto], ...],
+#    "goombas": [[x, y], ...], "hongos": [[x, y], ...],
+#    "tortugas": [[x, y, direccion], ...], "monedas": [[x, y], ...],
+#    "monedas_al_azar": {"cantidad": 10, "alto_minimo": 100}}
+#
+# Las monedas al azar se reparten como en crear_mundo: sobre plataformas
+# que estén al menos alto_minimo píxeles por encima del borde inferior.
+#
+# compilar() lo convierte en un binario compacto (.nivel) con los arreglos
+# ya empaquetados y el índice de plataformas de la rejilla espacial
+# precalculado. Al cargarlo se mapea en memoria y se lee sin copiar ni
+# volver a calcular nada, así que un nivel grande carga en milisegundos.
+#
+# Uso:  python niveles.py mundos/normal.json  (escribe mundos/normal.nivel)
+
+FIRMA = b'MNIV'
+VERSION = 1
+# firma, versión, tamaño de celda, cantidades (plataformas, goombas, hongos,
+# tortugas, monedas fijas, monedas al azar, plataformas para monedas, celdas,
+# índices) y celdas extremas (col_min, fila_min, col_max, fila_max)
+_CABECERA = struct.Struct('<4sHH9i4i')
+# (nombre en el JSON, enteros por elemento)
+_ARREGLOS = (('plataformas', 4), ('goombas', 2), ('hongos', 2), ('tortugas', 3), ('monedas', 2))
+
+
+def _leer_fuente(ruta):
+    with open(ruta) as f:
+        fuente = json.load(f)
+    if not fuente.get('plataformas'):
+        raise ValueError(f"{ruta}: el nivel necesita al menos una plataforma")
+    for nombre, largo in _ARREGLOS:
+        for elemento in fuente.get(nombre, []):
+            if len(elemento) != largo or not all(isinstance(v, int) for v in elemento):
+                raise ValueError(f"{ruta}: cada elemento de '{nombre}' debe tener {largo} enteros")
+    return fuente
+
+
+def compilar(fuente):
+    # Devuelve los bytes del nivel compilado a partir del JSON ya leído
+    plataformas = [pygame.Rect(p) for p in fuente['plataformas']]
+    azar = fuente.get('monedas_al_azar', {})
+    cantidad_azar = azar.get('cantidad', 0)
+    alto_minimo = azar.get('alto_minimo', 100)
+    validas = [i for i, p in enumerate(plataformas) if p.y < ALTO - alto_minimo]
+    if cantidad_azar and not validas:
+        raise ValueError("no hay plataformas donde poner las monedas al azar")
+
+    # El índice se arma con la misma rejilla que usa el juego
+    rejilla = RejillaEspacial()
+    for plataforma in plataformas:
+        rejilla.agregar_plataforma(plataforma)
+    celdas = []
+    indices = []
+    for (cx, cy), celda in sorted(rejilla.celdas_estaticas.items()):
+        celdas.extend((cx, cy, len(indices), len(celda)))
+        indices.extend(celda)
+
+    enteros = []
+    cantidades = []
+    for nombre, largo in _ARREGLOS:
+        elementos = fuente.get(nombre, [])
+        cantidades.append(len(elementos))
+        for elemento in elementos:
+            enteros.extend(elemento)
+    enteros.extend(validas)
+    enteros.extend(celdas)
+    enteros.extend(indices)
+
+    cabecera = _CABECERA.pack(FIRMA, VERSION, rejilla.tam_celda, *cantidades, cantidad_azar,
+                              len(validas), len(celdas) // 4, len(indices),
+                              rejilla.col_min, rejilla.fila_min, rejilla.col_max, rejilla.fila_max)
+    return cabecera + struct.pack(f'<{len(enteros)}i', *enteros)
+
+
+class Nivel:
+    # Nivel compilado. Se usa como generador del Juego: Nivel(rng) devuelve
+    # (plataformas, monedas, goombas, hongos, tortugas), y crear_rejilla()
+    # da la rejilla con el índice de plataformas ya cargado.
+    def __init__(self, datos):
+        (firma, version, self.tam_celda, n_plataformas, n_goombas, n_hongos, n_tortugas,
+         n_monedas, self.monedas_al_azar, n_validas, n_celdas, n_indices,
+         *self.limites) = _CABECERA.unpack_from(datos, 0)
+        if firma != FIRMA or version != VERSION:
+            raise ValueError("no es un nivel compilado válido")
+
+        # Vista de enteros sobre los datos (sin copiarlos)
+        enteros = memoryview(datos)[_CABECERA.size:].cast('i')
+        pos = 0
+
+        def tomar(cantidad):
+            nonlocal pos
+            vista = enteros[pos:pos + cantidad]
+            pos += cantidad
+            return vista
+
+        p = tomar(4 * n_plataformas)
+        self.plataformas = [pygame.Rect(p[i], p[i + 1], p[i + 2], p[i + 3])
+                            for i in range(0, len(p), 4)]
+        self.goombas = tomar(2 * n_goombas)
+        self.hongos = tomar(2 * n_hongos)
+        self.tortugas = tomar(3 * n_tortugas)
+        self.monedas = tomar(2 * n_monedas)
+        self.validas = [self.plataformas[i] for i in tomar(n_validas)]
+
+        c = tomar(4 * n_celdas)
+        indices = tomar(n_indices)
+        self.celdas = {(c[i], c[i + 1]): indices[c[i + 2]:c[i + 2] + c[i + 3]].tolist()
+                       for i in range(0, len(c), 4)}
+
+    @classmethod
+    def abrir(cls, ruta):
+        with open(ruta, 'rb') as f:
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(datos)
+
+    def __call__(self, rng):
+        g, h, t, m = self.goombas, self.hongos, self.tortugas, self.monedas
+        goombas = [Goomba(g[i], g[i + 1]) for i in range(0, len(g), 2)]
+        hongos = [Hongo(h[i], h[i + 1]) for i in range(0, len(h), 2)]
+        tortugas = [Tortuga(t[i], t[i + 1], t[i + 2]) for i in range(0, len(t), 3)]
+        monedas = [Estrella(m[i], m[i + 1]) for i in range(0, len(m), 2)]
+        for _ in range(self.monedas_al_azar):
+            plat = rng.choice(self.validas)
+            monedas.append(Estrella(
+                rng.randint(plat.x + 10, plat.x + plat.width - 30),
+                plat.y - 30
+            ))
+        return self.plataformas, monedas, goombas, hongos, tortugas
+
+    def crear_rejilla(self):
+        rejilla = RejillaEspacial(self.tam_celda)
+        rejilla.cargar_plataformas(self.plataformas, self.celdas, self.limites)
+        return rejilla
+
+
+def ruta_compilada(ruta):
+    return os.path.splitext(ruta)[0] + '.nivel'
+
+
+def cargar(nivel):
+    # Generador para Juego a partir del nombre de un nivel incluido
+    # ('normal', 'largo'), un JSON o un .nivel compilado. Un JSON se compila
+    # junto a él la primera vez y cada vez que cambia.
+    if nivel in NIVELES:
+        return NIVELES[nivel]
+    if nivel.endswith('.json'):
+        compilado = ruta_compilada(nivel)
+        if (not os.path.exists(compilado) or
+                os.path.getmtime(compilado) < os.path.getmtime(nivel)):
+            datos = compilar(_leer_fuente(nivel))
+            try:
+                with open(compilado, 'wb') as f:
+                    f.write(datos)
+            except OSError:
+                return Nivel(datos)  # Sin poder escribir, se usa desde memoria
+        nivel = compilado
+    return Nivel.abrir(nivel)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila niveles JSON a formato binario")
+    parser.add_argument('fuentes', nargs='+', metavar='NIVEL.json')
+    args = parser.parse_args()
+
+    for fuente in args.fuentes:
+        inicio = time.perf_counter()
+        try:
+            datos = compilar(_leer_fuente(fuente))
+        except (OSError, ValueError) as e:
+            print(f"Error al compilar {fuente}: {e}")
+            sys.exit(1)
+        destino = ruta_compilada(fuente)
+        with open(destino, 'wb') as f:
+            f.write(datos)
+        print(f"{fuente} -> {destino} ({len(datos)} bytes, "
+              f"{(time.perf_counter() - inicio) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import gc
+import json
+import sys
+import time
+
+import pygame
+
+from constantes import BLANCO, NEGRO
+
+# Perfilador por fases del bucle principal.
+#
+# Funciona como un cronómetro de vueltas: iniciar_cuadro() arranca el
+# cuadro y cada marcar('fase') suma el tiempo transcurrido desde la marca
+# anterior a esa fase. El juego y el renderizador solo marcan si tienen un
+# perfilador asignado (atributo perfilador distinto de None), así que
+# desactivado no cuesta más que una comprobación por fase.
+#
+# Los últimos cuadros se guardan en un búfer circular; se pueden ver en
+# pantalla (gráfica de tiempos por cuadro y barras por fase) y exportar en
+# el formato de trazas de Chrome (chrome://tracing, Perfetto).
+
+PRESUPUESTO_MS = 1000 / 60
+
+COLORES_FASES = [
+    (230, 80, 80), (80, 200, 80), (80, 140, 240), (240, 200, 60), (200, 90, 220),
+    (60, 210, 210), (250, 140, 50), (170, 170, 170), (120, 80, 40), (255, 120, 180),
+]
+
+
+class Perfilador:
+    def __init__(self, capacidad=300):
+        self.capacidad = capacidad
+        # Búfer circular: cada cuadro es (inicio_ns, total_ns, fases, contadores)
+        # con fases = [(nombre, inicio_ns, duración_ns, bloques, objetos_gc), ...]
+        self.cuadros = [None] * capacidad
+        self.indice = 0
+        self.cantidad = 0
+        self.colores = {}
+        self.visible = False
+        self.fuente = None
+
+        self._inicio = 0
+        self._ultima = 0
+        self._fases = []
+        self._bloques = 0
+        self._recolecciones = 0
+        self._bloques_fase = 0
+        self._objetos_fase = 0
+        self._origen = time.perf_counter_ns()
+
+    def iniciar_cuadro(self):
+        self._inicio = self._ultima = time.perf_counter_ns()
+        self._fases = []
+        self._bloques = sys.getallocatedblocks()
+        self._recolecciones = self._total_recolecciones()
+        self._bloques_fase = self._bloques
+        self._objetos_fase = gc.get_count()[0]
+
+    def marcar(self, fase):
+        # Además del tiempo, cada fase guarda la variación neta de bloques de
+        # memoria y de objetos seguidos por el gc (los que disparan las
+        # recolecciones; solo tiene sentido si ninguna ocurre en medio, ver
+        # memoria.RecolectorDiferido). Lo que reserva el propio perfilador
+        # no se cuenta.
+        bloques = sys.getallocatedblocks() - self._bloques_fase
+        objetos = gc.get_count()[0] - self._objetos_fase
+        ahora = time.perf_counter_ns()
+        self._fases.append((fase, self._ultima, ahora - self._ultima, bloques, objetos))
+        self._ultima = ahora
+        self._bloques_fase = sys.getallocatedblocks()
+        self._objetos_fase = gc.get_count()[0]
+
+    def terminar_cuadro(self, entidades=0):
+        fin = time.perf_counter_ns()
+        contadores = {
+            'entidades': entidades,
+            # Variación neta de bloques de memoria de Python en el cuadro
+            'bloques': sys.getallocatedblocks() - self._bloques,
+            'recolecciones_gc': self._total_recolecciones() - self._recolecciones,
+        }
+        self.cuadros[self.indice] = (self._inicio, fin - self._inicio, self._fases, contadores)
+        self.indice = (self.indice + 1) % self.capacidad
+        self.cantidad = min(self.cantidad + 1, self.capacidad)
+
+    @staticmethod
+    def _total_recolecciones():
+        return sum(generacion['collections'] for generacion in gc.get_stats())
+
+    def ultimos(self, n=None):
+        # Cuadros guardados, del más viejo al más nuevo
+        n = self.cantidad if n is None else min(n, self.cantidad)
+        return [self.cuadros[(self.indice - n + i) % self.capacidad] for i in range(n)]
+
+    def promedios(self, n=60):
+        # Milisegundos promedio por fase en los últimos n cuadros
+        cuadros = self.ultimos(n)
+        totales = {}
+        for _, _, fases, _ in cuadros:
+            for nombre, _, duracion, _, _ in fases:
+                totales[nombre] = totales.get(nombre, 0) + duracion
+        return {nombre: total / len(cuadros) / 1e6 for nombre, total in totales.items()}
+
+    def exportar_traza(self, ruta):
+        # Formato "Trace Event" de Chrome: un evento completo (ph 'X') por
+        # cuadro y por fase, con tiempos en microsegundos
+        eventos = []
+        for inicio, total, fases, contadores in self.ultimos():
+            eventos.append({'name': 'cuadro', 'ph': 'X', 'pid': 1, 'tid': 1,
+                            'ts': (inicio - self._origen) / 1000, 'dur': total / 1000,
+                            'args': contadores})
+            for nombre, desde, duracion, bloques, objetos in fases:
+                eventos.append({'name': nombre, 'ph': 'X', 'pid': 1, 'tid': 2,
+                                'ts': (desde - self._origen) / 1000, 'dur': duracion / 1000,
+                                'args': {'bloques': bloques, 'objetos_gc': objetos}})
+            eventos.append({'name': 'entidades', 'ph': 'C', 'pid': 1,
+                            'ts': (inicio - self._origen) / 1000,
+                            'args': {'entidades': contadores['entidades']}})
+        with open(ruta, 'w') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f)
+
+    # Superposición en pantalla
+
+    def alternar(self):
+        self.visible = not self.visible
+
+    def _color(self, fase):
+        if fase not in self.colores:
+            self.colores[fase] = COLORES_FASES[len(self.colores) % len(COLORES_FASES)]
+        return self.colores[fase]
+
+    def dibujar(self, pantalla):
+        # Devuelve el rectángulo dibujado (o None si está oculto)
+        if not self.visible or not self.cantidad:
+            return None
+        if self.fuente is None:
+            self.fuente = pygame.font.SysFont(None, 18)
+
+        ancho, alto = 300, 190
+        x0 = pantalla.get_width() - ancho - 10
+        y0 = 10
+        panel = pygame.Rect(x0, y0, ancho, alto)
+        pantalla.fill(NEGRO, panel)
+
+        # Gráfica de tiempo por cuadro (escala: 2 x presupuesto arriba)
+        alto_grafica = 60
+        escala = alto_grafica / (2 * PRESUPUESTO_MS)
+        cuadros = self.ultimos(ancho - 10)
+        for i, (_, total, _, _) in enumerate(cuadros):
+            ms = total / 1e6
+            h = min(alto_grafica, int(ms * escala))
+            color = (80, 200, 80) if ms <= PRESUPUESTO_MS else (230, 80, 80)
+            pygame.draw.line(pantalla, color, (x0 + 5 + i, y0 + 5 + alto_grafica),
+                             (x0 + 5 + i, y0 + 5 + alto_grafica - h))
+        linea = y0 + 5 + alto_grafica - int(PRESUPUESTO_MS * escala)
+        pygame.draw.line(pantalla, BLANCO, (x0 + 5, linea), (x0 + ancho - 5, linea))
+
+        # Barras por fase (promedio de los últimos 60 cuadros)
+        y = y0 + alto_grafica + 12
+        for fase, ms in sorted(self.promedios().items(), key=lambda f: -f[1])[:6]:
+            largo = min(ancho - 130, int(ms * (ancho - 130) / PRESUPUESTO_MS))
+            pygame.draw.rect(pantalla, self._color(fase), (x0 + 5, y, max(1, largo), 10))
+            texto = self.fuente.render(f"{fase} {ms:.2f} ms", True, BLANCO)
+            pantalla.blit(texto, (x0 + ancho - 120, y - 2))
+            y += 14
+
+        _, total, _, contadores = self.cuadros[(self.indice - 1) % self.capacidad]
+        texto = self.fuente.render(
+            f"{total / 1e6:.1f} ms  ent {contadores['entidades']}  "
+            f"bloques {contadores['bloques']:+d}  gc {contadores['recolecciones_gc']}",
+            True, BLANCO)
+        pantalla.blit(texto, (x0 + 5, y0 + alto - 16))
+        return panel
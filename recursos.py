@@ -0,0 +1,205 @@
+from array import array
+import hashlib
+import io
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from constantes import ANCHO, ALTO
+
+# Gestor de recursos (imágenes y sonidos).
+#
+# - Las imágenes se cargan al usarse por primera vez, o en segundo plano
+#   con precargar() mientras se muestra la pantalla de carga.
+# - Los píxeles ya escalados se guardan comprimidos en una caché en disco,
+#   con clave hash del archivo original + tamaño final, para no decodificar
+#   ni escalar los PNG en cada arranque.
+# - Los sonidos largos no se decodifican enteros: se reproducen desde disco
+#   con pygame.mixer.music. También los que pesan más de MAX_EN_MEMORIA,
+#   aunque no estén marcados, para que agregar un sonido no dispare la
+#   memoria. Los que no tienen archivo se sintetizan al cargarlos.
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_CACHE = os.path.join(DIRECTORIO, '.cache_recursos')
+
+# nombre -> (archivo, tamaño en pantalla, con transparencia)
+IMAGENES = {
+    'fondo': ('fondo.png', (ANCHO, ALTO), False),
+    'mario_pequeno': ('mariop.png', (50, 50), True),
+    'mario_grande': ('mariop.png', (70, 70), True),
+    'goomba': ('goomba.png', (40, 40), True),
+    'hongo': ('hongo.png', (30, 30), True),
+    'moneda': ('moneda.png', (30, 30), True),
+    'tortuga': ('tortuga.png', (50, 50), True),
+}
+
+# nombre -> (archivo o None si se sintetiza, se reproduce en streaming)
+SONIDOS = {
+    'moneda': ('coin.wav', False),
+    'pisar': (None, False),
+    'game_over': ('lose.wav', True),
+}
+MAX_EN_MEMORIA = 256 * 1024
+
+_CABECERA = struct.Struct('<4sHH')  # firma, ancho, alto
+_FIRMA = b'RCP1'
+
+
+class SonidoStreaming:
+    # Sonido largo que se lee desde disco mientras suena
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def play(self):
+        pygame.mixer.music.load(self.ruta)
+        pygame.mixer.music.play()
+
+    def stop(self):
+        pygame.mixer.music.stop()
+
+
+def sintetizar_pisar(duracion=0.08):
+    # Golpe corto: onda cuadrada que baja de 400 a 100 Hz y se apaga
+    frecuencia, formato, canales = pygame.mixer.get_init()
+    if formato != -16:
+        raise pygame.error("el mezclador no usa muestras de 16 bits")
+    total = int(frecuencia * duracion)
+    muestras = array('h')
+    fase = 0.0
+    for i in range(total):
+        avance = i / total
+        fase += (400 - 300 * avance) / frecuencia
+        valor = int(6000 * (1 - avance) * (1 if fase % 1 < 0.5 else -1))
+        muestras.extend([valor] * canales)
+    return pygame.mixer.Sound(buffer=muestras.tobytes())
+
+
+# nombre -> función que crea el sonido (los de SONIDOS sin archivo)
+SINTETIZADOS = {'pisar': sintetizar_pisar}
+
+
+class GestorRecursos:
+    def __init__(self, directorio=DIRECTORIO, directorio_cache=DIRECTORIO_CACHE, usar_cache=True):
+        self.directorio = directorio
+        self.directorio_cache = directorio_cache
+        self.usar_cache = usar_cache
+        self._imagenes = {}    # nombre -> Surface lista para dibujar
+        self._pendientes = {}  # nombre -> Future con los píxeles
+        self._sonidos = {}     # nombre -> Sound, SonidoStreaming o None si falló
+        self._hilos = None
+
+    def _ruta(self, archivo):
+        return os.path.join(self.directorio, archivo)
+
+    # Imágenes
+
+    def _leer_pixeles(self, nombre):
+        # Devuelve (modo, tamaño, bytes) de la imagen ya escalada. No usa la
+        # pantalla, así que puede correr en un hilo de fondo.
+        archivo, tamano, alfa = IMAGENES[nombre]
+        modo = 'RGBA' if alfa else 'RGB'
+        with open(self._ruta(archivo), 'rb') as f:
+            datos = f.read()
+
+        ruta_cache = None
+        if self.usar_cache:
+            clave = hashlib.sha1(datos).hexdigest()
+            ruta_cache = os.path.join(self.directorio_cache,
+                                      f"{clave}_{tamano[0]}x{tamano[1]}_{modo}.bin")
+            pixeles = self._leer_cache(ruta_cache, tamano)
+            if pixeles is not None:
+                return modo, tamano, pixeles
+
+        superficie = pygame.image.load(io.BytesIO(datos), archivo)
+        superficie = pygame.transform.scale(superficie, tamano)
+        pixeles = pygame.image.tobytes(superficie, modo)
+        if ruta_cache:
+            self._escribir_cache(ruta_cache, tamano, pixeles)
+        return modo, tamano, pixeles
+
+    def _leer_cache(self, ruta, tamano):
+        try:
+            with open(ruta, 'rb') as f:
+                firma, ancho, alto = _CABECERA.unpack(f.read(_CABECERA.size))
+                if firma != _FIRMA or (ancho, alto) != tamano:
+                    return None
+                return zlib.decompress(f.read())
+        except (OSError, struct.error, zlib.error):
+            return None
+
+    def _escribir_cache(self, ruta, tamano, pixeles):
+        # Se escribe en un temporal y se renombra para no dejar archivos a medias
+        try:
+            os.makedirs(self.directorio_cache, exist_ok=True)
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as f:
+                f.write(_CABECERA.pack(_FIRMA, *tamano))
+                f.write(zlib.compress(pixeles, 1))
+            os.replace(temporal, ruta)
+        except OSError:
+            pass  # Sin caché se sigue funcionando, solo arranca más lento
+
+    def precargar(self, hilos=4):
+        # Empieza a leer todas las imágenes en segundo plano
+        if self._hilos is None:
+            self._hilos = ThreadPoolExecutor(max_workers=hilos)
+        for nombre in IMAGENES:
+            if nombre not in self._imagenes and nombre not in self._pendientes:
+                self._pendientes[nombre] = self._hilos.submit(self._leer_pixeles, nombre)
+        return self
+
+    def progreso(self):
+        # Fracción de imágenes listas (0..1)
+        listas = sum(1 for nombre in IMAGENES
+                     if nombre in self._imagenes or
+                     (nombre in self._pendientes and self._pendientes[nombre].done()))
+        return listas / len(IMAGENES)
+
+    def imagen(self, nombre):
+        superficie = self._imagenes.get(nombre)
+        if superficie is not None:
+            return superficie
+
+        pendiente = self._pendientes.pop(nombre, None)
+        if pendiente is not None:
+            modo, tamano, pixeles = pendiente.result()
+        else:
+            modo, tamano, pixeles = self._leer_pixeles(nombre)
+        superficie = pygame.image.frombytes(pixeles, tamano, modo)
+        # La conversión al formato de la pantalla necesita una ventana
+        if pygame.display.get_surface() is not None:
+            superficie = superficie.convert_alpha() if modo == 'RGBA' else superficie.convert()
+        self._imagenes[nombre] = superficie
+        return superficie
+
+    # Sonidos
+
+    def sonido(self, nombre):
+        # Devuelve el sonido (cargado la primera vez que se pide) o None si
+        # no se pudo cargar
+        if nombre in self._sonidos:
+            return self._sonidos[nombre]
+        archivo, streaming = SONIDOS[nombre]
+        try:
+            if archivo is None:
+                sonido = SINTETIZADOS[nombre]()
+            else:
+                # getsize también comprueba que el archivo exista
+                ruta = self._ruta(archivo)
+                if streaming or os.path.getsize(ruta) > MAX_EN_MEMORIA:
+                    sonido = SonidoStreaming(ruta)
+                else:
+                    sonido = pygame.mixer.Sound(ruta)
+        except (pygame.error, OSError) as e:
+            print(f"Error al cargar sonidos: {e}")
+            sonido = None
+        self._sonidos[nombre] = sonido
+        return sonido
+
+    def cerrar(self):
+        if self._hilos is not None:
+            self._hilos.shutdown(wait=False, cancel_futures=True)
+            self._hilos = None
@@ -0,0 +1,568 @@
+import argparse
+import multiprocessing
+import os
+import random
+import selectors
+import socket
+import struct
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from constantes import ANCHO, FPS, REINICIAR
+from juego import Juego, GRUPOS
+import niveles
+from sectores import Camara
+
+# Servidor de partidas por UDP, cliente ligero y prueba de carga.
+#
+# El servidor simula muchas partidas independientes (una por cliente) en un
+# solo bucle de paso fijo. Los clientes solo mandan sus entradas y dibujan:
+# reciben en cada tick el estado visible (jugador, monedas, hongos y
+# enemigos cargados) comprimido como delta respecto al último tick que
+# confirmaron, así que solo viajan las entidades que cambiaron desde
+# entonces. Si un paquete se pierde, el siguiente delta sigue siendo contra
+# un estado que el cliente tiene; si el cliente no confirma nada reciente,
+# recibe el estado completo.
+#
+# Mensajes (un datagrama cada uno, enteros little-endian):
+#   cliente -> servidor
+#     'H' + nivel          unirse a una partida nueva en ese nivel (uno incluido
+#                          o el nombre de un archivo de mundos/, sin carpeta)
+#     'E' generación, ack, entradas
+#                          último tick recibido y máscara de entradas
+#     '?'                  pedir estadísticas (responde 'I' + texto)
+#     'X'                  salir
+#   servidor -> cliente
+#     'B' sesión, hz, semilla + nivel    bienvenida
+#     'S' cabecera + cambios + quitadas  estado del tick (ver _CABECERA)
+#
+# Al reiniciar una partida (R) sus ticks vuelven a empezar: la sesión pasa
+# a la generación siguiente, olvida su historial y su ack y manda el estado
+# completo. Los mensajes de otra generación se descartan a los dos lados.
+#
+# Uso:  python red.py --servir                 (servidor en el puerto 5555)
+#       python red.py --carga 200 --segundos 10 (servidor + 200 clientes)
+#       python mario.py --servidor localhost:5555 (cliente con ventana)
+
+PUERTO = 5555
+HISTORIAL = 32         # Ticks de estado que se recuerdan por cliente
+TIEMPO_INACTIVO = 10   # Segundos sin mensajes antes de cerrar la sesión
+MAX_DATAGRAMA = 65000
+# Los clientes solo pueden pedir niveles incluidos o archivos de esta carpeta
+DIRECTORIO_MUNDOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mundos')
+
+_BIENVENIDA = struct.Struct('<IHQ')  # sesión, hz, semilla
+_ENTRADAS = struct.Struct('<HIB')    # generación, ack, entradas
+# generación, tick, tick base (0 = estado completo), puntaje, vidas, eventos,
+# banderas del jugador, x, y, dirección, ancho, alto, cambios, quitadas
+_CABECERA = struct.Struct('<HIIiBBBffbHHHH')
+_ENTIDAD = struct.Struct('<IBffb')  # id, grupo, x, y, dirección
+_ID = struct.Struct('<I')
+
+# Bits de eventos y de banderas del jugador
+EVENTOS = ('moneda', 'pisar', 'game_over')
+GRANDE, INVENCIBLE, VICTORIA = 1, 2, 4
+
+
+# Servidor
+
+def nombre_en_red(nivel):
+    # Los niveles propios viajan solo con el nombre del archivo: el
+    # servidor los busca en su carpeta mundos/
+    return nivel if nivel in niveles.NIVELES else os.path.basename(nivel)
+
+
+def ruta_nivel(nivel):
+    # Nombre recibido por la red -> lo que recibe niveles.cargar
+    return nivel if nivel in niveles.NIVELES else os.path.join(DIRECTORIO_MUNDOS, nivel)
+
+
+def nivel_permitido(nivel):
+    # El nombre viene de la red: nada de rutas fuera de mundos/
+    if nivel in niveles.NIVELES:
+        return True
+    if '\x00' in nivel or '/' in nivel or os.sep in nivel or (os.altsep and os.altsep in nivel):
+        return False
+    if not nivel.endswith(('.json', '.nivel')):
+        return False
+    try:
+        ruta = os.path.realpath(ruta_nivel(nivel))
+    except (ValueError, OSError):
+        return False
+    return os.path.dirname(ruta) == os.path.realpath(DIRECTORIO_MUNDOS)
+
+
+class Sesion:
+    def __init__(self, id, direccion, nivel, semilla, hz):
+        self.id = id
+        self.direccion = direccion  # (host, puerto) del cliente
+        self.nivel = nivel
+        self.juego = Juego(hz=hz, semilla=semilla, generador=niveles.cargar(ruta_nivel(nivel)))
+        self.entradas = 0
+        self.reiniciar = False
+        self.generacion = 0     # Aumenta con cada reinicio de la partida
+        self.avisada = False    # Ya se avisó de un estado demasiado grande
+        self.ack = 0
+        self.ultimo_mensaje = time.monotonic()
+        self.ids = {}           # entidad -> id de red
+        self.siguiente_id = 1
+        self.historial = {}     # tick -> {id: registro empaquetado}
+
+    def reiniciada(self):
+        # Los ticks de la partida nueva empiezan de cero: nada del historial
+        # ni lo confirmado sirve como base
+        self.generacion = (self.generacion + 1) & 0xFFFF
+        self.ack = 0
+        self.historial.clear()
+
+    def estado(self):
+        # Registros de las entidades visibles del tick, por id de red. Las
+        # que salen de las listas (muertas o congeladas) pierden su id.
+        anteriores = self.ids
+        ids = {}
+        registros = {}
+        for grupo_i, grupo in enumerate(GRUPOS):
+            for entidad in getattr(self.juego, grupo):
+                id = anteriores.get(entidad)
+                if id is None:
+                    id = self.siguiente_id
+                    self.siguiente_id += 1
+                ids[entidad] = id
+                registros[id] = _ENTIDAD.pack(id, grupo_i, entidad.x, entidad.y,
+                                              getattr(entidad, 'direccion', 1))
+        self.ids = ids
+        return registros
+
+    def paquete(self, eventos):
+        juego = self.juego
+        registros = self.estado()
+        self.historial[juego.ticks] = registros
+        self.historial.pop(juego.ticks - HISTORIAL, None)
+
+        base = self.historial.get(self.ack) if self.ack != juego.ticks else None
+        if base is None:
+            tick_base = 0
+            cambios = list(registros.values())
+            quitadas = []
+        else:
+            tick_base = self.ack
+            cambios = [r for id, r in registros.items() if base.get(id) != r]
+            quitadas = [_ID.pack(id) for id in base if id not in registros]
+
+        j = juego.jugador
+        banderas = ((GRANDE if j.grande else 0) | (INVENCIBLE if j.invencible else 0) |
+                    (VICTORIA if juego.victoria else 0))
+        bits = 0
+        for i, evento in enumerate(EVENTOS):
+            if evento in eventos:
+                bits |= 1 << i
+        cabecera = _CABECERA.pack(self.generacion, juego.ticks, tick_base, juego.puntaje, max(0, j.vidas), bits,
+                                  banderas, j.x, j.y, j.direccion, j.ancho, j.alto,
+                                  len(cambios), len(quitadas))
+        return b'S' + cabecera + b''.join(cambios) + b''.join(quitadas)
+
+
+class Servidor:
+    def __init__(self, puerto=PUERTO, hz=FPS, host='127.0.0.1'):
+        self.hz = hz
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+        self.socket.bind((host, puerto))
+        self.socket.setblocking(False)
+        self.sesiones = {}  # dirección -> Sesion
+        self.siguiente_sesion = 1
+        self.rng = random.Random()
+
+        # Estadísticas desde el último pedido
+        self.ticks = 0
+        self.ocupado = 0.0
+        self.bytes_enviados = 0
+        self.paquetes_enviados = 0
+        self.descartados = 0  # Estados que no cabían en un datagrama
+        self.inicio = time.perf_counter()
+
+    def _recibir(self):
+        while True:
+            try:
+                datos, direccion = self.socket.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue
+            if not datos:
+                continue
+            tipo = datos[:1]
+            sesion = self.sesiones.get(direccion)
+            if tipo == b'E' and sesion:
+                if len(datos) < 1 + _ENTRADAS.size:
+                    continue
+                generacion, ack, entradas = _ENTRADAS.unpack_from(datos, 1)
+                if generacion == sesion.generacion:
+                    sesion.ack = max(sesion.ack, ack)
+                sesion.entradas = entradas & ~REINICIAR
+                # El reinicio se aplica una vez aunque llegue repetido
+                sesion.reiniciar = sesion.reiniciar or bool(entradas & REINICIAR)
+                sesion.ultimo_mensaje = time.monotonic()
+            elif tipo == b'H':
+                try:
+                    nivel = datos[1:].decode()
+                except UnicodeDecodeError:
+                    continue
+                self._unir(direccion, nivel or 'normal')
+            elif tipo == b'?':
+                self._enviar(b'I' + self.estadisticas().encode(), direccion)
+            elif tipo == b'X' and sesion:
+                del self.sesiones[direccion]
+
+    def _unir(self, direccion, nivel):
+        sesion = self.sesiones.get(direccion)
+        if sesion is None:
+            if not nivel_permitido(nivel):
+                return  # El cliente no recibe bienvenida
+            try:
+                niveles.cargar(ruta_nivel(nivel))
+            except (OSError, ValueError):
+                return  # Nivel desconocido: el cliente no recibe bienvenida
+            sesion = Sesion(self.siguiente_sesion, direccion, nivel,
+                            self.rng.randrange(2**32), self.hz)
+            self.siguiente_sesion += 1
+            self.sesiones[direccion] = sesion
+        self._enviar(b'B' + _BIENVENIDA.pack(sesion.id, self.hz, sesion.juego.semilla) +
+                     sesion.nivel.encode(), direccion)
+
+    def _enviar(self, datos, direccion):
+        try:
+            self.socket.sendto(datos, direccion)
+        except (BlockingIOError, InterruptedError):
+            return  # Búfer lleno: el cliente recibirá el delta siguiente
+        except OSError:
+            return
+        self.bytes_enviados += len(datos)
+        self.paquetes_enviados += 1
+
+    def tick(self):
+        ahora = time.monotonic()
+        for direccion, sesion in list(self.sesiones.items()):
+            if ahora - sesion.ultimo_mensaje > TIEMPO_INACTIVO:
+                del self.sesiones[direccion]
+                continue
+            entradas = sesion.entradas
+            if sesion.reiniciar:
+                entradas |= REINICIAR
+                sesion.reiniciar = False
+                sesion.reiniciada()
+            eventos = sesion.juego.step(entradas)
+            paquete = sesion.paquete(eventos)
+            if len(paquete) <= MAX_DATAGRAMA:
+                self._enviar(paquete, direccion)
+            else:
+                # No se parte en varios datagramas: el cliente se queda sin
+                # ese tick, y sin sincronizar si tampoco cabe el estado completo
+                self.descartados += 1
+                if not sesion.avisada:
+                    sesion.avisada = True
+                    print(f"Sesión {sesion.id}: estado de {len(paquete)} bytes, más que un "
+                          f"datagrama ({MAX_DATAGRAMA}); no se envía")
+        self.ticks += 1
+
+    def estadisticas(self):
+        segundos = time.perf_counter() - self.inicio
+        uso = self.ocupado / segundos if segundos else 0.0
+        n = len(self.sesiones)
+        texto = (f"sesiones {n}  ticks {self.ticks}  uso {uso:.0%}  "
+                 f"sesiones/núcleo {n / uso if uso else 0:.0f}  "
+                 f"bytes/tick/cliente {self.bytes_enviados / max(1, self.paquetes_enviados):.0f}  "
+                 f"descartados por tamaño {self.descartados}")
+        self.ticks = 0
+        self.ocupado = 0.0
+        self.bytes_enviados = 0
+        self.paquetes_enviados = 0
+        self.descartados = 0
+        self.inicio = time.perf_counter()
+        return texto
+
+    def servir(self, segundos=None):
+        # Bucle de paso fijo: entre ticks se atienden los mensajes
+        periodo = 1 / self.hz
+        selector = selectors.DefaultSelector()
+        selector.register(self.socket, selectors.EVENT_READ)
+        proximo = time.perf_counter()
+        fin = None if segundos is None else proximo + segundos
+        while fin is None or proximo < fin:
+            espera = proximo - time.perf_counter()
+            if espera > 0:
+                selector.select(espera)
+                self._recibir()
+                continue
+            inicio = time.perf_counter()
+            self._recibir()
+            self.tick()
+            self.ocupado += time.perf_counter() - inicio
+            proximo += periodo
+            # Si el servidor no da abasto no intenta recuperar los ticks perdidos
+            if time.perf_counter() - proximo > 8 * periodo:
+                proximo = time.perf_counter()
+        selector.close()
+        self.socket.close()
+
+
+# Cliente
+
+class EntidadRemota:
+    __slots__ = ('x', 'y', 'x_ant', 'y_ant', 'ancho', 'alto', 'direccion', 'grande',
+                 'invencible', 'vidas')
+
+    def __init__(self, ancho, alto):
+        self.x = self.y = self.x_ant = self.y_ant = 0.0
+        self.ancho = ancho
+        self.alto = alto
+        self.direccion = 1
+        self.grande = False
+        self.invencible = False
+        self.vidas = 3
+
+    def guardar_posicion(self):
+        self.x_ant = self.x
+        self.y_ant = self.y
+
+
+# Tamaño de las entidades de cada grupo (el servidor no lo envía)
+TAMANOS = {'monedas': (30, 30), 'hongos': (30, 30), 'tortugas': (50, 50), 'goombas': (40, 40)}
+
+
+class EstadoRemoto:
+    # Réplica del estado de una partida del servidor, con los atributos que
+    # usa render.Renderizador (monedas, jugador, cámara, puntaje...)
+    def __init__(self, nivel='normal'):
+        plataformas = niveles.cargar(ruta_nivel(nivel))(random.Random(0))[0]
+        self.plataformas = plataformas
+        self.version_mundo = 1
+        self.ancho_mundo = max([ANCHO] + [p.right for p in plataformas])
+        self.camara = Camara(self.ancho_mundo)
+        self.jugador = EntidadRemota(40, 60)
+        self.puntaje = 0
+        self.victoria = False
+        self.monedas, self.hongos, self.tortugas, self.goombas = [], [], [], []
+        self.generacion = 0
+        self.tick = 0
+        self.historial = {}  # tick -> {id: (grupo, x, y, dirección)}
+        self.entidades = {}  # id -> EntidadRemota
+
+    @property
+    def game_over(self):
+        return self.jugador.vidas <= 0
+
+    def aplicar(self, datos):
+        # Aplica un mensaje 'S'. Devuelve los eventos del tick, o None si el
+        # mensaje es viejo o su base ya no está en el historial.
+        (generacion, tick, base, puntaje, vidas, bits, banderas, x, y, direccion, ancho, alto,
+         n_cambios, n_quitadas) = _CABECERA.unpack_from(datos, 1)
+        if generacion != self.generacion:
+            # Solo se pasa a una generación posterior (con vuelta a cero)
+            if (generacion - self.generacion) & 0xFFFF >= 0x8000:
+                return None
+            self.generacion = generacion
+            self.tick = 0
+            self.historial.clear()
+        if tick <= self.tick:
+            return None
+        if base:
+            anterior = self.historial.get(base)
+            if anterior is None:
+                return None
+            estado = dict(anterior)
+        else:
+            estado = {}
+        pos = 1 + _CABECERA.size
+        for _ in range(n_cambios):
+            id, grupo, ex, ey, ed = _ENTIDAD.unpack_from(datos, pos)
+            estado[id] = (grupo, ex, ey, ed)
+            pos += _ENTIDAD.size
+        for _ in range(n_quitadas):
+            estado.pop(_ID.unpack_from(datos, pos)[0], None)
+            pos += _ID.size
+        self.tick = tick
+        self.historial[tick] = estado
+        # Con paquetes perdidos hay ticks que faltan: se quitan todos los viejos
+        for viejo in [t for t in self.historial if t <= tick - HISTORIAL]:
+            del self.historial[viejo]
+
+        self.puntaje = puntaje
+        self.victoria = bool(banderas & VICTORIA)
+        j = self.jugador
+        j.guardar_posicion()
+        j.x, j.y, j.direccion, j.ancho, j.alto = x, y, direccion, ancho, alto
+        j.vidas = vidas
+        j.grande = bool(banderas & GRANDE)
+        j.invencible = bool(banderas & INVENCIBLE)
+        self.camara.guardar_posicion()
+        self.camara.seguir(j)
+        self._actualizar_listas(estado)
+        return [evento for i, evento in enumerate(EVENTOS) if bits & (1 << i)]
+
+    def _actualizar_listas(self, estado):
+        anteriores = self.entidades
+        self.entidades = {}
+        listas = ([], [], [], [])
+        for id in sorted(estado):
+            grupo, x, y, direccion = estado[id]
+            entidad = anteriores.get(id)
+            if entidad is None:
+                entidad = EntidadRemota(*TAMANOS[GRUPOS[grupo]])
+                entidad.x, entidad.y = x, y
+            entidad.guardar_posicion()
+            entidad.x, entidad.y, entidad.direccion = x, y, direccion
+            self.entidades[id] = entidad
+            listas[grupo].append(entidad)
+        self.monedas, self.hongos, self.tortugas, self.goombas = listas
+
+
+class Cliente:
+    def __init__(self, servidor=('127.0.0.1', PUERTO), nivel='normal'):
+        self.servidor = servidor
+        self.nivel = nombre_en_red(nivel)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.socket.connect(servidor)
+        self.estado = None
+        self.entradas = 0
+        self.bytes_recibidos = 0
+        self.estados_recibidos = 0
+
+    def unirse(self):
+        self.socket.send(b'H' + self.nivel.encode())
+
+    def enviar_entradas(self, entradas):
+        # El reinicio va solo en este mensaje, no en las confirmaciones
+        self.entradas = entradas & ~REINICIAR
+        generacion = self.estado.generacion if self.estado else 0
+        tick = self.estado.tick if self.estado else 0
+        try:
+            self.socket.send(b'E' + _ENTRADAS.pack(generacion, tick, entradas))
+        except (BlockingIOError, ConnectionRefusedError):
+            pass
+
+    def recibir(self):
+        # Procesa los mensajes pendientes; devuelve los eventos recibidos
+        eventos = []
+        while True:
+            try:
+                datos = self.socket.recv(MAX_DATAGRAMA + 100)
+            except (BlockingIOError, InterruptedError, ConnectionRefusedError):
+                return eventos
+            self.bytes_recibidos += len(datos)
+            tipo = datos[:1]
+            if tipo == b'B' and self.estado is None:
+                self.estado = EstadoRemoto(datos[1 + _BIENVENIDA.size:].decode())
+            elif tipo == b'S' and self.estado is not None:
+                nuevos = self.estado.aplicar(datos)
+                if nuevos is not None:
+                    self.estados_recibidos += 1
+                    eventos.extend(nuevos)
+                    # Confirmar cada estado recibido
+                    self.enviar_entradas(self.entradas)
+
+    def cerrar(self):
+        try:
+            self.socket.send(b'X')
+        except OSError:
+            pass
+        self.socket.close()
+
+
+def pedir_estadisticas(servidor, espera=2.0):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(espera)
+    try:
+        s.sendto(b'?', servidor)
+        datos, _ = s.recvfrom(4096)
+        return datos[1:].decode()
+    except OSError:
+        return None
+    finally:
+        s.close()
+
+
+# Prueba de carga
+
+def _servir(puerto, hz, segundos):
+    Servidor(puerto, hz).servir(segundos)
+
+
+def prueba_de_carga(clientes, segundos, puerto=PUERTO, hz=FPS, nivel='normal', servidor=None):
+    # Sin servidor dado, se lanza uno local en otro proceso
+    proceso = None
+    if servidor is None:
+        servidor = ('127.0.0.1', puerto)
+        proceso = multiprocessing.Process(target=_servir, args=(puerto, hz, segundos + 5),
+                                          daemon=True)
+        proceso.start()
+        time.sleep(0.5)
+
+    rng = random.Random(0)
+    conectados = [Cliente(servidor, nivel) for _ in range(clientes)]
+    selector = selectors.DefaultSelector()
+    for cliente in conectados:
+        cliente.unirse()
+        selector.register(cliente.socket, selectors.EVENT_READ, cliente)
+
+    pedir_estadisticas(servidor)  # Reinicia los contadores del servidor
+    inicio = time.perf_counter()
+    proximo_cambio = inicio
+    while time.perf_counter() - inicio < segundos:
+        if time.perf_counter() >= proximo_cambio:
+            # Cada tercio de segundo cada cliente cambia de teclas al azar
+            for cliente in conectados:
+                cliente.enviar_entradas(rng.randrange(16))
+            proximo_cambio += 1 / 3
+        for clave, _ in selector.select(0.01):
+            clave.data.recibir()
+    estadisticas = pedir_estadisticas(servidor)
+
+    recibidos = sum(c.bytes_recibidos for c in conectados)
+    estados = sum(c.estados_recibidos for c in conectados)
+    for cliente in conectados:
+        cliente.cerrar()
+    selector.close()
+    if proceso:
+        proceso.terminate()
+        proceso.join()
+
+    esperados = clientes * hz * segundos
+    print(f"Clientes: {clientes}  estados recibidos: {estados} de {esperados:.0f} "
+          f"({estados / esperados:.0%})")
+    print(f"Bytes por tick por cliente: {recibidos / max(1, estados):.0f}")
+    print(f"Servidor: {estadisticas or 'sin respuesta'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de partidas y prueba de carga")
+    parser.add_argument('--servir', action='store_true', help="correr el servidor")
+    parser.add_argument('--carga', type=int, metavar='CLIENTES',
+                        help="prueba de carga con esa cantidad de clientes")
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--hz', type=int, default=FPS)
+    parser.add_argument('--nivel', default='normal')
+    parser.add_argument('--servidor', metavar='HOST:PUERTO',
+                        help="probar contra un servidor ya lanzado")
+    args = parser.parse_args()
+
+    if args.servir:
+        print(f"Servidor en el puerto {args.puerto} ({args.hz} ticks por segundo)")
+        Servidor(args.puerto, args.hz, host='0.0.0.0').servir()
+    elif args.carga:
+        servidor = None
+        if args.servidor:
+            host, puerto = args.servidor.rsplit(':', 1)
+            servidor = (host, int(puerto))
+        prueba_de_carga(args.carga, args.segundos, args.puerto, args.hz, args.nivel, servidor)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
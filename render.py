@@ -0,0 +1,283 @@
+from itertools import chain
+
+import pygame
+
+from constantes import ANCHO, ALTO, BLANCO, ROJO, VERDE, AZUL, MARRON_PLATAFORMA, VERDE_HIERBA
+from recursos import GestorRecursos, IMAGENES
+from sectores import TAM_SECTOR
+from sprites import CacheSprites, clave_entidad, clave_jugador
+from tiempo import SPRITES_SIMPLES, PLATAFORMAS_SIMPLES, RESOLUCION_BAJA
+
+# Dibujo del estado de un Juego. Es un cliente "delgado": solo lee los
+# atributos de las entidades y nunca modifica la simulación.
+
+# Capas de la cola de dibujo, de atrás hacia adelante
+CAPA_MONEDAS, CAPA_HONGOS, CAPA_ENEMIGOS, CAPA_JUGADOR = range(4)
+
+
+def cargar_imagenes(recursos):
+    # Cargar imágenes (solo fondo y personajes)
+    try:
+        imagenes = {nombre: recursos.imagen(nombre) for nombre in IMAGENES}
+        print("¡Imágenes principales cargadas correctamente!")
+    except (pygame.error, OSError) as e:
+        print(f"Error al cargar imágenes: {e}")
+        print("Usando gráficos vectoriales alternativos...")
+        imagenes = {}
+    return imagenes
+
+
+def dibujar_plataforma(pantalla, plataforma, detalle=True):
+    # Dibujar la parte principal de la plataforma (madera)
+    pygame.draw.rect(pantalla, MARRON_PLATAFORMA, plataforma)
+
+    # Dibujar hierba en la parte superior
+    pygame.draw.rect(pantalla, VERDE_HIERBA,
+                    (plataforma.x, plataforma.y - 5, plataforma.width, 10))
+
+    # Dibujar detalles de madera (rayas)
+    if not detalle:
+        return
+    for i in range(plataforma.x + 5, plataforma.x + plataforma.width, 15):
+        pygame.draw.line(pantalla, (101, 67, 33),
+                        (i, plataforma.y + 5),
+                        (i, plataforma.y + plataforma.height - 5), 2)
+
+
+def interpolar(entidad, alfa):
+    # Posición de dibujo entre el tick anterior y el actual
+    return (entidad.x_ant + (entidad.x - entidad.x_ant) * alfa,
+            entidad.y_ant + (entidad.y - entidad.y_ant) * alfa)
+
+
+class ColaDibujo:
+    # Sprites del cuadro agrupados por capa. Cada elemento es (superficie,
+    # posición, área del atlas), como los que acepta Surface.blits, y el
+    # cuadro entero se dibuja en orden de capas con una sola llamada.
+    def __init__(self, capas=4):
+        self.capas = [[] for _ in range(capas)]
+
+    def agregar(self, capa, variante, x, y):
+        # variante: (superficie, área, dx, dy) de CacheSprites.obtener
+        superficie, area, dx, dy = variante
+        self.capas[capa].append((superficie, (x + dx, y + dy), area))
+
+    def vaciar(self, destino, rects=False):
+        # Dibuja y vacía la cola; con rects=True devuelve los rectángulos
+        # dibujados
+        resultado = destino.blits(chain.from_iterable(self.capas), rects)
+        for capa in self.capas:
+            capa.clear()
+        return resultado
+
+
+class Renderizador:
+    def __init__(self, pantalla, recursos=None, rectangulos_sucios=False):
+        self.pantalla = pantalla
+        self.imagenes = cargar_imagenes(recursos or GestorRecursos())
+        self.sprites = CacheSprites(self.imagenes)
+        self.caches = {(1, False): self.sprites}  # (escala, simples) -> CacheSprites
+        self.fuente = pygame.font.SysFont(None, 36)
+        self.cola = ColaDibujo()
+
+        # Textos del HUD ya dibujados: el marcador solo se vuelve a dibujar
+        # cuando cambian las vidas o el puntaje
+        self.marcador = None
+        self.texto_marcador = None
+        self.textos = {}  # mensaje -> Surface
+
+        # Fondo y plataformas se hornean una vez en una superficie y solo se
+        # rehacen cuando cambia el mundo (juego.version_mundo). En niveles más
+        # anchos que la pantalla se hornea una capa por sector visible y la
+        # capa estática se recompone cuando la cámara se mueve.
+        self.capa_estatica = None
+        self.version_capa = None
+        self.capas_sectores = {}  # sector -> Surface
+        self.camara_capa = None
+
+        # En modo de rectángulos sucios solo se actualizan las zonas que
+        # tocan los sprites y textos de este cuadro y del anterior
+        self.rectangulos_sucios = rectangulos_sucios
+        self.rects_previos = None
+
+        # Calidad (ver tiempo.RitmoAdaptativo): con escala menor que 1 se
+        # dibuja en el lienzo reducido y se escala a la pantalla
+        self.calidad = 0
+        self.escala = 1
+        self.lienzo = pantalla
+        self.detalle = True
+
+        # Perfilador opcional (perfilador.Perfilador)
+        self.perfilador = None
+
+    def ajustar_calidad(self, nivel):
+        # Etapa de calidad de tiempo.RitmoAdaptativo (0 = completa)
+        if nivel == self.calidad:
+            return
+        self.calidad = nivel
+        self.escala = 0.5 if nivel >= RESOLUCION_BAJA else 1
+        simples = nivel >= SPRITES_SIMPLES
+        self.detalle = nivel < PLATAFORMAS_SIMPLES
+        if self.escala == 1:
+            self.lienzo = self.pantalla
+        else:
+            ancho, alto = self.pantalla.get_size()
+            self.lienzo = pygame.Surface((int(ancho * self.escala), int(alto * self.escala)))
+            self.lienzo = self.lienzo.convert(self.pantalla)
+        clave = (self.escala, simples)
+        if clave not in self.caches:
+            self.caches[clave] = CacheSprites(self.imagenes, self.escala, simples)
+        self.sprites = self.caches[clave]
+        self.invalidar()
+
+    def invalidar(self):
+        # Fuerza rehacer la capa estática y redibujar toda la pantalla
+        self.capa_estatica = None
+        self.capas_sectores = {}
+        self.rects_previos = None
+
+    def marcar_sucio(self, rect):
+        # Zona dibujada fuera del renderizador (p. ej. la superposición del
+        # perfilador) que hay que borrar en el próximo cuadro
+        if self.rects_previos is not None:
+            self.rects_previos.append(rect)
+
+    def _hornear(self, plataformas, desde):
+        # Fondo y plataformas vistos con el borde izquierdo en x = desde, al
+        # tamaño del lienzo
+        capa = pygame.Surface(self.pantalla.get_size()).convert()
+        # Dibujar fondo
+        if 'fondo' in self.imagenes:
+            capa.blit(self.imagenes['fondo'], (0, 0))
+        else:
+            capa.fill(AZUL)  # Fondo azul si no hay imagen
+        # Dibujar plataformas
+        ancho = capa.get_width()
+        for plataforma in plataformas:
+            if plataforma.right > desde and plataforma.x < desde + ancho:
+                dibujar_plataforma(capa, plataforma.move(-desde, 0), self.detalle)
+        if self.lienzo is not self.pantalla:
+            capa = pygame.transform.smoothscale(capa, self.lienzo.get_size())
+        return capa
+
+    def _capa_estatica(self, juego, camara_x):
+        if self.version_capa != juego.version_mundo:
+            self.invalidar()
+            self.version_capa = juego.version_mundo
+        if juego.ancho_mundo <= ANCHO:
+            # Nivel de una pantalla: la cámara no se mueve
+            if self.capa_estatica is None:
+                self.capa_estatica = self._hornear(juego.plataformas, 0)
+                self.rects_previos = None
+            return self.capa_estatica
+
+        if self.capa_estatica is None or camara_x != self.camara_capa:
+            if self.capa_estatica is None:
+                self.capa_estatica = pygame.Surface(self.lienzo.get_size()).convert()
+            primero = camara_x // TAM_SECTOR
+            ultimo = (camara_x + ANCHO - 1) // TAM_SECTOR
+            # Solo se conservan las capas de los sectores visibles
+            capas = {}
+            for sector in range(primero, ultimo + 1):
+                capa = self.capas_sectores.get(sector)
+                if capa is None:
+                    capa = self._hornear(juego.plataformas, sector * TAM_SECTOR)
+                capas[sector] = capa
+                self.capa_estatica.blit(capa, (int((sector * TAM_SECTOR - camara_x) * self.escala // 1), 0))
+            self.capas_sectores = capas
+            self.camara_capa = camara_x
+            self.rects_previos = None
+        return self.capa_estatica
+
+    def _texto(self, mensaje, color):
+        # Mensajes fijos (victoria, game over), dibujados una sola vez
+        texto = self.textos.get(mensaje)
+        if texto is None:
+            texto = self.textos[mensaje] = self.fuente.render(mensaje, True, color)
+        return texto
+
+    def _encolar(self, capa, entidades, nombre, alfa, izq, der):
+        # Encola las entidades visibles de un grupo. Casi todas comparten
+        # variante de sprite, así que solo se busca otra vez cuando cambia el
+        # tamaño o la dirección respecto a la entidad anterior.
+        elementos = self.cola.capas[capa]
+        obtener = self.sprites.obtener
+        escala = self.escala
+        con_direccion = nombre == 'tortuga'  # Como en clave_entidad
+        ancho = alto = direccion = None
+        for entidad in entidades:
+            x = entidad.x_ant + (entidad.x - entidad.x_ant) * alfa
+            if x + entidad.ancho > izq and x < der:
+                d = entidad.direccion if con_direccion else 1
+                if entidad.ancho != ancho or entidad.alto != alto or d != direccion:
+                    ancho, alto, direccion = entidad.ancho, entidad.alto, d
+                    superficie, area, dx, dy = obtener(clave_entidad(nombre, entidad))
+                    dx -= izq * escala
+                y = entidad.y_ant + (entidad.y - entidad.y_ant) * alfa
+                elementos.append((superficie, (x * escala + dx, y * escala + dy), area))
+
+    def dibujar(self, juego, alfa=1.0):
+        # Devuelve la lista de rectángulos a actualizar con
+        # pygame.display.update(), o None si hay que actualizar toda la pantalla
+        pantalla = self.pantalla
+        lienzo = self.lienzo
+        escala = self.escala
+        jugador = juego.jugador
+        perf = self.perfilador
+        camara = juego.camara
+        cx = int(interpolar(camara, alfa)[0])
+        capa = self._capa_estatica(juego, cx)
+
+        # A resolución baja se escala el lienzo entero y no hay rectángulos sucios
+        sucios_activo = self.rectangulos_sucios and lienzo is pantalla
+        completo = not sucios_activo or self.rects_previos is None
+        if completo:
+            lienzo.blit(capa, (0, 0))
+        else:
+            # Borrar los sprites del cuadro anterior con la capa estática
+            for rect in self.rects_previos:
+                pantalla.blit(capa, rect, rect)
+        if perf:
+            perf.marcar('dibujo_fondo')
+
+        # Solo se encola lo que toca la cámara, en coordenadas de pantalla
+        izq, der = cx, cx + camara.ancho
+        self._encolar(CAPA_MONEDAS, juego.monedas, 'moneda', alfa, izq, der)
+        self._encolar(CAPA_HONGOS, juego.hongos, 'hongo', alfa, izq, der)
+
+        # Efecto de parpadeo mientras el jugador es invencible: se decide una
+        # vez por cuadro y oculta a los enemigos y al jugador
+        visible = not jugador.invencible or pygame.time.get_ticks() % 200 < 100
+        if visible:
+            self._encolar(CAPA_ENEMIGOS, juego.tortugas, 'tortuga', alfa, izq, der)
+            self._encolar(CAPA_ENEMIGOS, juego.goombas, 'goomba', alfa, izq, der)
+            x, y = interpolar(jugador, alfa)
+            self.cola.agregar(CAPA_JUGADOR, self.sprites.obtener(clave_jugador(jugador)),
+                              (x - cx) * escala, y * escala)
+        rects = self.cola.vaciar(lienzo, sucios_activo) or []
+        if lienzo is not pantalla:
+            pygame.transform.scale(lienzo, pantalla.get_size(), pantalla)
+        if perf:
+            perf.marcar('dibujo_sprites')
+
+        # Mostrar puntaje y vidas
+        if self.marcador != (jugador.vidas, juego.puntaje):
+            self.marcador = (jugador.vidas, juego.puntaje)
+            self.texto_marcador = self.fuente.render(
+                f"Vidas: {jugador.vidas}  Puntaje: {juego.puntaje}", True, BLANCO)
+        rects.append(pantalla.blit(self.texto_marcador, (10, 10)))
+
+        if juego.victoria:
+            texto_victoria = self._texto("¡GANASTE! - Presiona R para reiniciar", VERDE)
+            rects.append(pantalla.blit(texto_victoria, (ANCHO//2 - 150, ALTO//2 - 18)))
+        elif juego.game_over:  # El Game Over original
+            texto_gameover = self._texto("GAME OVER - Presiona R para reiniciar", ROJO)
+            rects.append(pantalla.blit(texto_gameover, (ANCHO//2 - 180, ALTO//2 - 18)))
+        if perf:
+            perf.marcar('dibujo_hud')
+
+        if not sucios_activo:
+            return None
+        sucios = None if completo else self.rects_previos + rects
+        self.rects_previos = rects
+        return sucios
@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import struct
+import sys
+import time
+
+from juego import Juego, GRUPOS
+import niveles
+
+# Grabación y reproducción determinista de partidas.
+#
+# Un archivo de repetición guarda la semilla, la configuración del Juego y
+# el nivel, y luego las entradas de cada tick comprimidas por tramos (entradas, ticks):
+# como las teclas cambian poco, una partida de varios minutos ocupa pocos KB.
+# Al cerrar se añade el hash del estado final, que la reproducción sin
+# ventana y a máxima velocidad debe volver a obtener.
+#
+# Uso:  python repeticion.py partida.rep
+
+FIRMA = b'MREP'
+VERSION = 2
+_CABECERA = struct.Struct('<4sBQHB')  # firma, versión, semilla, hz, vectorizado
+_NIVEL = struct.Struct('<B')           # largo del nombre del nivel (versión 2)
+_TRAMO = struct.Struct('<BH')          # entradas, ticks (0 ticks = fin)
+_PIE = struct.Struct('<Q32s')          # ticks totales, sha256 del estado final
+MAX_TRAMO = 0xFFFF
+
+
+def _empaquetar_entidad(datos, entidad, *campos):
+    for campo in campos:
+        datos.append(float(getattr(entidad, campo)))
+
+
+def hash_estado(juego):
+    # Hash del estado de la simulación (no incluye nada del renderizado)
+    juego.sincronizar()
+    datos = [juego.ticks, juego.puntaje, juego.victoria, juego.ultimo_tiempo_tortuga,
+             juego.intervalo_tortugas]
+    j = juego.jugador
+    _empaquetar_entidad(datos, j, 'x', 'y', 'vel_x', 'vel_y', 'ancho', 'alto', 'vidas',
+                        'direccion', 'tiempo_invencible', 'invencible', 'saltando',
+                        'grande', 'cayendo_activo')
+    for grupo in (juego.monedas, juego.hongos, juego.tortugas, juego.goombas):
+        datos.append(len(grupo))
+        for entidad in grupo:
+            _empaquetar_entidad(datos, entidad, 'x', 'y')
+            if hasattr(entidad, 'direccion'):
+                _empaquetar_entidad(datos, entidad, 'direccion')
+    # Entidades congeladas en sectores lejanos (un nivel de una pantalla no
+    # tiene ninguna, y su hash no cambia)
+    for grupo, entidad in juego.sectores.todas():
+        datos.append(GRUPOS.index(grupo))
+        _empaquetar_entidad(datos, entidad, 'x', 'y')
+        if hasattr(entidad, 'direccion'):
+            _empaquetar_entidad(datos, entidad, 'direccion')
+    h = hashlib.sha256(struct.pack(f'<{len(datos)}d', *datos))
+    h.update(repr(juego.rng.getstate()).encode())
+    return h.digest()
+
+
+class Grabadora:
+    def __init__(self, ruta, juego, nivel='normal'):
+        self.archivo = open(ruta, 'wb')
+        self.archivo.write(_CABECERA.pack(FIRMA, VERSION, juego.semilla, juego.hz,
+                                          juego.vectorizado))
+        nombre = nivel.encode()
+        self.archivo.write(_NIVEL.pack(len(nombre)) + nombre)
+        self.entradas = None
+        self.ticks = 0  # Ticks del tramo actual
+        self.total = 0
+
+    def registrar(self, entradas):
+        # Llamar una vez por tick, con las mismas entradas que recibe step()
+        if entradas != self.entradas or self.ticks == MAX_TRAMO:
+            self._escribir_tramo()
+            self.entradas = entradas
+        self.ticks += 1
+        self.total += 1
+
+    def _escribir_tramo(self):
+        if self.ticks:
+            self.archivo.write(_TRAMO.pack(self.entradas, self.ticks))
+        self.ticks = 0
+
+    def cerrar(self, juego):
+        self._escribir_tramo()
+        self.archivo.write(_TRAMO.pack(0, 0))
+        self.archivo.write(_PIE.pack(self.total, hash_estado(juego)))
+        self.archivo.close()
+
+
+def leer(ruta):
+    # Devuelve (cabecera, tramos, pie); pie es None si la grabación no se cerró
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    firma, version, semilla, hz, vectorizado = _CABECERA.unpack_from(datos, 0)
+    if firma != FIRMA or version not in (1, VERSION):
+        raise ValueError(f"{ruta} no es una repetición válida")
+    pos = _CABECERA.size
+    nivel = 'normal'  # La versión 1 no guardaba el nivel
+    if version >= 2:
+        largo, = _NIVEL.unpack_from(datos, pos)
+        pos += _NIVEL.size
+        nivel = datos[pos:pos + largo].decode()
+        pos += largo
+    cabecera = {'semilla': semilla, 'hz': hz, 'vectorizado': bool(vectorizado), 'nivel': nivel}
+
+    tramos = []
+    pie = None
+    while pos + _TRAMO.size <= len(datos):
+        entradas, ticks = _TRAMO.unpack_from(datos, pos)
+        pos += _TRAMO.size
+        if ticks == 0:
+            if pos + _PIE.size <= len(datos):
+                pie = _PIE.unpack_from(datos, pos)
+            break
+        tramos.append((entradas, ticks))
+    return cabecera, tramos, pie
+
+
+def reproducir(ruta, vectorizado=None):
+    # Repite la partida sin ventana y a máxima velocidad. Devuelve
+    # (juego, ticks repetidos, hash final, hash grabado o None)
+    cabecera, tramos, pie = leer(ruta)
+    if vectorizado is None:
+        vectorizado = cabecera['vectorizado']
+    juego = Juego(hz=cabecera['hz'], vectorizado=vectorizado, semilla=cabecera['semilla'],
+                  generador=niveles.cargar(cabecera['nivel']))
+    step = juego.step
+    total = 0
+    for entradas, ticks in tramos:
+        for _ in range(ticks):
+            step(entradas)
+        total += ticks
+    return juego, total, hash_estado(juego), pie[1] if pie else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce una partida grabada sin ventana")
+    parser.add_argument('archivo')
+    parser.add_argument('--vectorizado', action='store_true', default=None,
+                        help="forzar los enemigos vectorizados con NumPy")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    juego, total, final, esperado = reproducir(args.archivo, args.vectorizado)
+    segundos = time.perf_counter() - inicio
+
+    print(f"Ticks: {total}  Puntaje: {juego.puntaje}  Vidas: {juego.jugador.vidas}")
+    print(f"Velocidad: {total / max(segundos, 1e-9):.0f} ticks/s")
+    print(f"Hash final: {final.hex()}")
+    if esperado is None:
+        print("La grabación no tiene hash final (no se cerró)")
+        sys.exit(2)
+    if final != esperado:
+        print(f"DIFERENTE al grabado: {esperado.hex()}")
+        sys.exit(1)
+    print("Coincide con la grabación")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from math import floor
+
+from constantes import ANCHO, ALTO
+
+# Cámara con desplazamiento lateral y mundo dividido en sectores.
+#
+# La cámara centra al jugador sin salirse del mundo. Depende solo de la
+# posición del jugador, así que la simulación (que decide qué sectores
+# están cargados) y el dibujo ven siempre la misma.
+#
+# El mundo se divide en sectores de TAM_SECTOR píxeles de ancho. Solo los
+# sectores que ve la cámara y RADIO a cada lado están cargados: sus
+# entidades están en las listas del Juego y se simulan y dibujan. Las de los
+# sectores lejanos quedan guardadas aquí, congeladas, hasta que la cámara se
+# acerca. Un nivel de una sola pantalla está siempre cargado entero.
+
+TAM_SECTOR = ANCHO
+RADIO = 1
+
+
+class Camara:
+    def __init__(self, ancho_mundo, ancho=ANCHO, alto=ALTO):
+        self.ancho_mundo = ancho_mundo
+        self.ancho = ancho
+        self.alto = alto
+        self.x = 0
+        self.y = 0  # No hay desplazamiento vertical
+        self.guardar_posicion()
+
+    def guardar_posicion(self):
+        # Como las entidades, para interpolar el dibujo entre ticks
+        self.x_ant = self.x
+        self.y_ant = self.y
+
+    def seguir(self, entidad):
+        x = entidad.x + entidad.ancho / 2 - self.ancho / 2
+        self.x = max(0, min(x, self.ancho_mundo - self.ancho))
+
+
+class Sectores:
+    def __init__(self, tam=TAM_SECTOR, radio=RADIO):
+        self.tam = tam
+        self.radio = radio
+        self.rango = None    # (primer, último) sector cargado
+        self.dormidas = {}   # sector -> [(grupo, entidad), ...]
+        self.cantidades = {}  # grupo -> entidades dormidas de ese grupo
+
+    def sector(self, x):
+        return floor(x / self.tam)
+
+    def rango_para(self, camara):
+        return (self.sector(camara.x) - self.radio,
+                self.sector(camara.x + camara.ancho - 1) + self.radio)
+
+    def cargado(self, x):
+        primero, ultimo = self.rango
+        return primero <= self.sector(x) <= ultimo
+
+    def dormir(self, grupo, entidad):
+        self.dormidas.setdefault(self.sector(entidad.x), []).append((grupo, entidad))
+        self.cantidades[grupo] = self.cantidades.get(grupo, 0) + 1
+
+    def despertar(self, primero, ultimo):
+        # Saca y devuelve las entidades dormidas de los sectores del rango
+        despiertas = []
+        for sector in range(primero, ultimo + 1):
+            for grupo, entidad in self.dormidas.pop(sector, ()):
+                self.cantidades[grupo] -= 1
+                despiertas.append((grupo, entidad))
+        return despiertas
+
+    def cantidad(self, grupo):
+        return self.cantidades.get(grupo, 0)
+
+    def todas(self):
+        # Entidades dormidas en orden de sector, para el hash de estado
+        for sector in sorted(self.dormidas):
+            yield from self.dormidas[sector]
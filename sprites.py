@@ -0,0 +1,196 @@
+import math
+
+import pygame
+
+from constantes import NEGRO, BLANCO, ROJO, VERDE, AMARILLO, MARRON
+
+# Caché de variantes de sprites. Cada variante (imagen, dirección y tamaño)
+# se prepara una sola vez: las imágenes volteadas y los dibujos vectoriales
+# alternativos se rasterizan al cargar y se empaquetan en un único atlas,
+# así dibujar un sprite es siempre un blit, sin voltear ni calcular nada.
+
+ANCHO_ATLAS = 512
+MARGEN = 20  # Espacio alrededor del dibujo vectorial al rasterizarlo
+CLAVE = (255, 0, 255)  # Color transparente de los sprites simples
+
+
+# Dibujos vectoriales alternativos (cuando no se pudieron cargar imágenes)
+
+def vector_jugador(superficie, x, y, grande, ancho, alto, direccion):
+    size_factor = 1.3 if grande else 1.0
+    pygame.draw.rect(superficie, ROJO, (x, y + 20*size_factor,
+                                        ancho*size_factor, (alto - 20)*size_factor))
+    pygame.draw.rect(superficie, (0, 0, 255), (x, y + 30*size_factor,
+                                               ancho*size_factor, (alto - 30)*size_factor))
+    pygame.draw.circle(superficie, (255, 200, 150),
+                       (x + 20*size_factor, y + 15*size_factor),
+                       15*size_factor)
+    ojo_x = x + 25*size_factor if direccion > 0 else x + 15*size_factor
+    pygame.draw.circle(superficie, BLANCO, (ojo_x, y + 15*size_factor), 5*size_factor)
+    pygame.draw.circle(superficie, NEGRO, (ojo_x, y + 15*size_factor), 2*size_factor)
+
+
+def vector_goomba(superficie, x, y, ancho, alto):
+    pygame.draw.ellipse(superficie, MARRON, (x, y, ancho, alto))
+    pygame.draw.circle(superficie, BLANCO, (x + 10, y + 15), 5)
+    pygame.draw.circle(superficie, BLANCO, (x + 30, y + 15), 5)
+    pygame.draw.circle(superficie, NEGRO, (x + 10, y + 15), 2)
+    pygame.draw.circle(superficie, NEGRO, (x + 30, y + 15), 2)
+
+
+def vector_tortuga(superficie, x, y, ancho, alto, direccion):
+    # Solo estado normal, sin caparazón
+    pygame.draw.ellipse(superficie, VERDE, (x, y, ancho, alto))
+    pygame.draw.ellipse(superficie, (0, 100, 0), (x + 5, y + 15, ancho - 10, alto - 20))
+    # Cabeza
+    cabeza_x = x + (ancho - 15) if direccion > 0 else x
+    pygame.draw.ellipse(superficie, VERDE, (cabeza_x, y + 15, 15, 20))
+    pygame.draw.circle(superficie, NEGRO, (cabeza_x + 10 if direccion > 0 else cabeza_x + 5, y + 25), 2)
+
+
+def vector_estrella(superficie, x, y, ancho, alto):
+    # Dibujar estrella con polígonos
+    puntos = []
+    for i in range(5):
+        angulo = math.pi * 2 * i / 5 - math.pi/2
+        puntos.append((x + ancho/2 + math.cos(angulo) * ancho/2,
+                       y + alto/2 + math.sin(angulo) * alto/2))
+        angulo = math.pi * 2 * (i + 0.5) / 5 - math.pi/2
+        puntos.append((x + ancho/2 + math.cos(angulo) * ancho/4,
+                       y + alto/2 + math.sin(angulo) * alto/4))
+    pygame.draw.polygon(superficie, AMARILLO, puntos)
+
+
+def vector_hongo(superficie, x, y, ancho, alto):
+    pygame.draw.rect(superficie, ROJO, (x, y + 10, ancho, alto - 10))
+    pygame.draw.ellipse(superficie, BLANCO, (x - 5, y, ancho + 10, 20))
+    pygame.draw.circle(superficie, BLANCO, (x + 5, y + 10), 5)
+    pygame.draw.circle(superficie, BLANCO, (x + 25, y + 10), 5)
+
+
+# Claves de variantes: (nombre, dirección, tamaño)
+
+def clave_jugador(jugador):
+    return ('jugador', jugador.direccion, (jugador.grande, jugador.ancho, jugador.alto))
+
+
+def clave_entidad(nombre, entidad):
+    # Solo las tortugas miran hacia su dirección; el resto de sprites no
+    direccion = entidad.direccion if nombre == 'tortuga' else 1
+    return (nombre, direccion, (entidad.ancho, entidad.alto))
+
+
+def _convertir(superficie):
+    # convert_alpha() necesita una ventana (aunque sea la de SDL dummy)
+    if pygame.display.get_surface() is not None:
+        return superficie.convert_alpha()
+    return superficie
+
+
+def _simplificar(superficie):
+    # Copia sin alfa por píxel: los píxeles más transparentes que la mitad
+    # pasan al color clave, y con RLE el blit se salta las zonas vacías.
+    # Los bordes quedan dentados, pero se dibuja bastante más rápido.
+    mascara = pygame.mask.from_surface(superficie, 127)
+    simple = superficie.copy()
+    if pygame.display.get_surface() is not None:
+        simple = simple.convert()  # Sin canal alfa
+    mascara.to_surface(simple, setcolor=None, unsetcolor=CLAVE)
+    simple.set_colorkey(CLAVE, pygame.RLEACCEL)
+    return simple
+
+
+class CacheSprites:
+    # Tamaños de las entidades del juego, para preconstruir sus variantes
+    CLAVES_INICIALES = (
+        [('jugador', d, (False, 40, 60)) for d in (1, -1)] +
+        [('jugador', d, (True, 52, 78)) for d in (1, -1)] +
+        [('tortuga', d, (50, 50)) for d in (1, -1)] +
+        [('goomba', 1, (40, 40)), ('hongo', 1, (30, 30)), ('moneda', 1, (30, 30))]
+    )
+
+    def __init__(self, imagenes, escala=1, simples=False):
+        # escala: tamaño de dibujo respecto al de las entidades (0.5 para
+        # dibujar a media resolución); simples: sprites sin alfa por píxel
+        self.imagenes = imagenes
+        self.escala = escala
+        self.simples = simples
+        self.variantes = {}  # clave -> (superficie, área o None, dx, dy)
+        self.atlas = None
+        self._construir_atlas(self.CLAVES_INICIALES)
+
+    def _crear_variante(self, clave):
+        # Devuelve (superficie, dx, dy): el sprite y su desplazamiento
+        # respecto a la posición (x, y) de la entidad
+        nombre, direccion, tamano = clave
+        imagenes = self.imagenes
+        if nombre == 'jugador' and 'mario_pequeno' in imagenes:
+            img = imagenes['mario_grande' if tamano[0] else 'mario_pequeno']
+            return pygame.transform.flip(img, direccion == -1, False), 0, 0
+        if nombre == 'tortuga' and 'tortuga' in imagenes:
+            return pygame.transform.flip(imagenes['tortuga'], direccion == -1, False), 0, 0
+        if nombre in imagenes:
+            return imagenes[nombre], 0, 0
+
+        # Rasterizar el dibujo vectorial una sola vez
+        if nombre == 'jugador':
+            grande, ancho, alto = tamano
+        else:
+            ancho, alto = tamano
+        lienzo = pygame.Surface((ancho * 2 + 2 * MARGEN, alto * 2 + 2 * MARGEN), pygame.SRCALPHA)
+        if nombre == 'jugador':
+            vector_jugador(lienzo, MARGEN, MARGEN, grande, ancho, alto, direccion)
+        elif nombre == 'tortuga':
+            vector_tortuga(lienzo, MARGEN, MARGEN, ancho, alto, direccion)
+        elif nombre == 'goomba':
+            vector_goomba(lienzo, MARGEN, MARGEN, ancho, alto)
+        elif nombre == 'moneda':
+            vector_estrella(lienzo, MARGEN, MARGEN, ancho, alto)
+        else:
+            vector_hongo(lienzo, MARGEN, MARGEN, ancho, alto)
+        rect = lienzo.get_bounding_rect()
+        return lienzo.subsurface(rect).copy(), rect.x - MARGEN, rect.y - MARGEN
+
+    def _escalar(self, clave):
+        superficie, dx, dy = self._crear_variante(clave)
+        escala = self.escala
+        if escala != 1:
+            ancho, alto = superficie.get_size()
+            superficie = pygame.transform.smoothscale(
+                superficie, (max(1, round(ancho * escala)), max(1, round(alto * escala))))
+            dx *= escala
+            dy *= escala
+        return superficie, dx, dy
+
+    def _construir_atlas(self, claves):
+        # Empaquetado por estantes: filas de sprites de izquierda a derecha
+        sprites = [(clave,) + self._escalar(clave) for clave in claves]
+        x = y = alto_fila = 0
+        posiciones = []
+        for clave, superficie, dx, dy in sprites:
+            ancho, alto = superficie.get_size()
+            if x + ancho > ANCHO_ATLAS:
+                x = 0
+                y += alto_fila
+                alto_fila = 0
+            posiciones.append(pygame.Rect(x, y, ancho, alto))
+            x += ancho
+            alto_fila = max(alto_fila, alto)
+
+        self.atlas = _convertir(pygame.Surface((ANCHO_ATLAS, y + alto_fila), pygame.SRCALPHA))
+        for (clave, superficie, dx, dy), area in zip(sprites, posiciones):
+            self.atlas.blit(superficie, area)
+        if self.simples:
+            self.atlas = _simplificar(self.atlas)
+        for (clave, superficie, dx, dy), area in zip(sprites, posiciones):
+            self.variantes[clave] = (self.atlas, area, dx, dy)
+
+    def obtener(self, clave):
+        variante = self.variantes.get(clave)
+        if variante is None:
+            # Variante no prevista (p. ej. un tamaño nuevo): se crea una vez
+            # fuera del atlas y queda guardada
+            superficie, dx, dy = self._escalar(clave)
+            superficie = _simplificar(superficie) if self.simples else _convertir(superficie)
+            variante = self.variantes[clave] = (superficie, None, dx, dy)
+        return variante
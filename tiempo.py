@@ -0,0 +1,106 @@
+from collections import deque
+
+from constantes import FPS
+
+# Planificador de paso fijo con acumulador. La física siempre avanza en
+# ticks de 1/hz segundos, sin importar cuánto tarde cada cuadro dibujado;
+# el resto del acumulador (alfa) sirve para interpolar el dibujo.
+#
+# RitmoAdaptativo mira cuánto trabajo llevan los últimos cuadros y baja la
+# calidad del dibujo por etapas cuando no entran en el presupuesto de
+# 1/FPS, y la vuelve a subir cuando sobra tiempo. Las etapas se acumulan:
+#   SALTAR_CUADROS       se dibuja un cuadro de cada dos (la física sigue igual)
+#   SPRITES_SIMPLES      sprites sin alfa por píxel (color clave con RLE)
+#   PLATAFORMAS_SIMPLES  plataformas sin las vetas de madera
+#   RESOLUCION_BAJA      se dibuja a la mitad de resolución y se escala
+# En pantallas quietas (victoria, game over) el bucle baja a FPS_REPOSO
+# cuadros por segundo para gastar menos; la física recupera los ticks de
+# cada cuadro con el acumulador, así que la simulación no cambia.
+
+SALTAR_CUADROS, SPRITES_SIMPLES, PLATAFORMAS_SIMPLES, RESOLUCION_BAJA = range(1, 5)
+FPS_REPOSO = 15
+
+
+class PasoFijo:
+    def __init__(self, hz=FPS, max_pasos=8, max_saltos=4):
+        self.dt = 1.0 / hz
+        self.max_pasos = max_pasos    # Ticks máximos por cuadro (evita la espiral de muerte)
+        self.max_saltos = max_saltos  # Cuadros seguidos sin dibujar como máximo
+        self.acumulado = 0.0
+        self.saltados = 0
+
+    def avanzar(self, segundos):
+        # Suma el tiempo real transcurrido y devuelve cuántos ticks correr
+        self.acumulado += segundos
+        pasos = int(self.acumulado / self.dt)
+        if pasos > self.max_pasos:
+            pasos = self.max_pasos
+        self.acumulado -= pasos * self.dt
+        # Si seguimos muy atrasados se descarta el tiempo que no se puede recuperar
+        if self.acumulado > self.max_pasos * self.dt:
+            self.acumulado = self.max_pasos * self.dt
+        return pasos
+
+    @property
+    def atrasado(self):
+        return self.acumulado >= self.dt
+
+    @property
+    def alfa(self):
+        # Fracción del siguiente tick ya transcurrida (0..1)
+        return min(self.acumulado / self.dt, 1.0)
+
+    def debe_dibujar(self, permitido=True):
+        # Cuando vamos atrasados se salta el dibujo para dejar el cuadro a la
+        # física, pero nunca más de max_saltos cuadros seguidos. permitido:
+        # lo que dice otro control del mismo cuadro (RitmoAdaptativo); sus
+        # saltos también cuentan para el máximo.
+        if (self.atrasado or not permitido) and self.saltados < self.max_saltos:
+            self.saltados += 1
+            return False
+        self.saltados = 0
+        return True
+
+
+class RitmoAdaptativo:
+    def __init__(self, fps=FPS, ventana=30, bajar=0.9, subir=0.5, espera=60, fps_reposo=FPS_REPOSO):
+        self.fps = fps
+        self.fps_reposo = fps_reposo
+        self.presupuesto = 1.0 / fps
+        self.tiempos = deque(maxlen=ventana)  # Trabajo de los últimos cuadros
+        self.bajar = bajar    # Fracción del presupuesto que hace bajar la calidad
+        self.subir = subir    # Fracción por debajo de la cual vuelve a subir
+        self.espera = espera  # Cuadros sin cambiar de etapa tras un cambio
+        self.enfriamiento = 0
+        self.nivel = 0
+        self.cuadro = 0
+
+    def registrar(self, segundos):
+        # Tiempo de trabajo del cuadro (sin la espera del reloj). Devuelve
+        # True si cambió la etapa de calidad.
+        self.tiempos.append(segundos)
+        if self.enfriamiento:
+            self.enfriamiento -= 1
+            return False
+        if len(self.tiempos) < self.tiempos.maxlen:
+            return False
+        # Percentil 90: unos pocos picos sueltos no bajan la calidad
+        carga = sorted(self.tiempos)[len(self.tiempos) * 9 // 10] / self.presupuesto
+        if carga > self.bajar and self.nivel < RESOLUCION_BAJA:
+            self.nivel += 1
+        elif carga < self.subir and self.nivel > 0:
+            self.nivel -= 1
+        else:
+            return False
+        self.tiempos.clear()
+        self.enfriamiento = self.espera
+        return True
+
+    def debe_dibujar(self):
+        # Llamar una vez por cuadro. El contador avanza aquí y no en
+        # registrar(), que no se llama en las pantallas de reposo
+        self.cuadro += 1
+        return self.nivel < SALTAR_CUADROS or self.cuadro % 2 == 0
+
+    def fps_objetivo(self, reposo):
+        return self.fps_reposo if reposo else self.fps